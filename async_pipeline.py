@@ -0,0 +1,182 @@
+# async_pipeline.py
+"""
+Concurrent variant extraction on top of AsyncOpenAI.
+
+Runs the same two-stage flow as process_with_gpt_two_calls for many PDFs at
+once. At most `concurrency` PDFs are in flight and, since a large catalog
+sends several Stage 1 sections at once, a separate semaphore keeps at most
+`concurrency` LLM requests open at any time. Every request also passes a
+shared requests/min + tokens/min limiter. Results come back in input order.
+"""
+
+import asyncio
+import functools
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import openai
+
+from config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_CACHE_BYPASS, PARSE_RETRIES
+from process_api_variants import (
+    OPENAI_MODEL,
+    TEMPERATURE,
+    response_cache,
+    record_usage,
+    text_cache_key,
+    structured_output_format,
+    load_pdf_tables,
+    extract_drawing_with_vision,
+    try_fast_path,
+    plan_stage1_prompts,
+    parse_stage1,
+    merge_stage1_sections,
+    build_stage2_prompt,
+    parse_stage2,
+    run_local_stage2,
+    merge_stage2,
+)
+from rate_limit import RateLimiter, estimate_tokens
+from run_stats import stats
+
+PdfResult = Tuple[str, Union[List[Dict[str, Any]], Exception]]
+
+
+async def _to_thread(func, *args):
+    # asyncio.to_thread needs Python 3.9; the requirements still allow 3.8
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+async def _aresponses_text(
+    client: openai.AsyncOpenAI,
+    limiter: RateLimiter,
+    requests: asyncio.Semaphore,
+    prompt: str,
+    text_format: Optional[Dict[str, Any]] = None,
+    refresh: bool = False,
+) -> str:
+    # same cache keys as process_api_variants._responses_text
+    key = text_cache_key(prompt, text_format)
+    if response_cache is not None and not (LLM_CACHE_BYPASS or refresh):
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    extra = {"text": text_format} if text_format else {}
+    async with requests:
+        await limiter.acquire_async(estimate_tokens(prompt))
+        resp = await client.responses.create(
+            model=OPENAI_MODEL,
+            input=prompt,
+            temperature=TEMPERATURE,
+            **extra,
+        )
+    record_usage(getattr(resp, "usage", None))
+    out = (getattr(resp, "output_text", None) or "").strip()
+
+    if response_cache is not None and out:
+        response_cache.put(key, out)
+    return out
+
+
+async def _acall_and_parse(client, limiter, requests, prompt: str, parse, text_format=None):
+    # async twin of process_api_variants.call_and_parse
+    for attempt in range(PARSE_RETRIES + 1):
+        raw = await _aresponses_text(client, limiter, requests, prompt, text_format, refresh=attempt > 0)
+        try:
+            return parse(raw)
+        except ValueError:
+            stats.incr("parse_failures")
+            if attempt == PARSE_RETRIES:
+                raise
+            stats.incr("parse_retries")
+
+
+async def _process_pdf(
+    client: openai.AsyncOpenAI,
+    limiter: RateLimiter,
+    sem: asyncio.Semaphore,
+    requests: asyncio.Semaphore,
+    pdf_path: str,
+    custom_prompt: str,
+    format_prompt: str,
+    known_fields: Optional[List[str]],
+    extract_backend: Optional[str],
+) -> List[Dict[str, Any]]:
+    async with sem:
+        # PDF parsing is blocking/CPU-bound: keep it off the event loop
+        text, tables = await _to_thread(load_pdf_tables, pdf_path, extract_backend)
+
+        if not tables:
+            # a (blocking) vision request: it counts against the open requests too
+            async with requests:
+                return [await _to_thread(extract_drawing_with_vision, pdf_path)]
+
+        local = try_fast_path(tables, known_fields)
+        if local is not None:
+            return local
+
+        text_format = structured_output_format(known_fields)
+
+        # one prompt normally, several sections for very large catalogs
+        plan = plan_stage1_prompts(custom_prompt, text, tables, pdf_path)
+        parsed = await asyncio.gather(*[
+            _acall_and_parse(client, limiter, requests, prompt, lambda raw, t=t: parse_stage1(raw, t), text_format)
+            for prompt, t in plan
+        ])
+        stage1 = merge_stage1_sections(list(parsed))
+        if not stage1:
+            return []
+
+        resolved, unresolved = run_local_stage2(stage1, known_fields)
+        if not unresolved:
+            return merge_stage2(resolved, [])
+
+        llm_rows = await _acall_and_parse(
+            client, limiter, requests,
+            build_stage2_prompt(format_prompt, unresolved),
+            lambda raw: parse_stage2(raw, unresolved),
+            text_format,
+        )
+        return merge_stage2(resolved, llm_rows)
+
+
+async def process_pdfs_async(
+    pdf_paths: List[str],
+    custom_prompt: str,
+    format_prompt: str,
+    concurrency: int = 4,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    client: Optional[openai.AsyncOpenAI] = None,
+    known_fields: Optional[List[str]] = None,
+    extract_backend: Optional[str] = None,
+) -> List[PdfResult]:
+    """
+    Processes all PDFs concurrently. Returns (pdf_path, variants) pairs in input
+    order; a failed PDF carries its exception instead of a variant list.
+    """
+    own_client = client is None
+    if own_client:
+        client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    # PDFs in flight and open LLM requests are bounded separately: one PDF may send several requests
+    requests = asyncio.Semaphore(max(1, concurrency))
+    try:
+        results = await asyncio.gather(
+            *[
+                _process_pdf(client, limiter, sem, requests, p, custom_prompt, format_prompt, known_fields, extract_backend)
+                for p in pdf_paths
+            ],
+            return_exceptions=True,
+        )
+    finally:
+        if own_client:
+            await client.close()
+
+    return list(zip(pdf_paths, results))
+
+
+def process_pdfs_concurrently(pdf_paths: List[str], custom_prompt: str, format_prompt: str, **kwargs) -> List[PdfResult]:
+    """Blocking wrapper around process_pdfs_async for the (synchronous) GUI."""
+    return asyncio.run(process_pdfs_async(pdf_paths, custom_prompt, format_prompt, **kwargs))
@@ -0,0 +1,401 @@
+# batch_mode.py
+"""
+Offline bulk mode on the OpenAI Batch API.
+
+All Stage 1 requests are written to Batch-API JSONL and submitted at once;
+when that batch completes, the Stage 2 requests are generated from its
+results and submitted as a second batch. Answers are joined back to their
+source PDFs by custom_id and go through the same parse_stage1/parse_stage2
+(normalize_variant_keys + expand_numeric_dn_columns) path as the
+interactive pipeline.
+
+LocalBatchBackend is a file-based stand-in for the batch endpoint, so the
+whole flow can be run end to end without network access:
+
+    python batch_mode.py --local some.pdf other.pdf
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from process_api_variants import (
+    OPENAI_MODEL,
+    TEMPERATURE,
+    record_usage,
+    structured_output_format,
+    load_pdf_tables,
+    extract_drawing_with_vision,
+    try_fast_path,
+    plan_stage1_prompts,
+    parse_stage1,
+    merge_stage1_sections,
+    build_stage2_prompt,
+    parse_stage2,
+    run_local_stage2,
+    merge_stage2,
+)
+from run_stats import stats
+
+# Batch API limits per input file
+BATCH_MAX_REQUESTS = 50000
+BATCH_MAX_BYTES = 190 * 1024 * 1024
+
+_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _output_text_from_body(body: Dict[str, Any]) -> str:
+    """Same as Response.output_text, for a raw JSON response body."""
+    parts = []
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for c in item.get("content") or []:
+            if c.get("type") == "output_text":
+                parts.append(c.get("text") or "")
+    return "".join(parts).strip()
+
+
+def _parse_output_lines(lines) -> Dict[str, str]:
+    out = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        rec = json.loads(line)
+        resp = rec.get("response") or {}
+        if rec.get("error") or resp.get("status_code") != 200:
+            continue
+        body = resp.get("body") or {}
+        record_usage(body.get("usage"))
+        out[rec["custom_id"]] = _output_text_from_body(body)
+    return out
+
+
+# ==============================
+# Backends
+# ==============================
+
+class OpenAIBatchBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, jsonl_path: str) -> str:
+        with open(jsonl_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, str]:
+        batch = self.client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            return {}
+        content = self.client.files.content(batch.output_file_id).text
+        return _parse_output_lines(content.splitlines())
+
+    def cancel(self, batch_id: str) -> None:
+        self.client.batches.cancel(batch_id)
+
+
+def echo_json_responder(body: Dict[str, Any]) -> str:
+    """
+    Default answer of the local backend: echoes the last JSON array of objects
+    found in the request input. Stage 1 inputs only contain table arrays, so
+    Stage 1 answers "[]" (and the table fallback kicks in); Stage 2 echoes the
+    Stage 1 rows back.
+    """
+    text = body.get("input") or ""
+    decoder = json.JSONDecoder()
+    found = []
+    i = text.find("[")
+    while i != -1:
+        try:
+            value, end = decoder.raw_decode(text, i)
+        except ValueError:
+            i = text.find("[", i + 1)
+            continue
+        if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+            found = value
+        i = text.find("[", end)
+    return json.dumps(found, ensure_ascii=False)
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the batch endpoint. Each submitted batch gets a
+    folder holding input.jsonl and, once "processed", output.jsonl in the
+    Batch API output format. Answers come from `responder(request_body)`.
+    """
+
+    def __init__(self, folder: str, responder: Callable[[Dict[str, Any]], str] = echo_json_responder):
+        self.folder = folder
+        self.responder = responder
+        os.makedirs(folder, exist_ok=True)
+
+    def submit(self, jsonl_path: str) -> str:
+        batch_id = "batch_local_" + uuid.uuid4().hex[:12]
+        bdir = os.path.join(self.folder, batch_id)
+        os.makedirs(bdir)
+        shutil.copyfile(jsonl_path, os.path.join(bdir, "input.jsonl"))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        bdir = os.path.join(self.folder, batch_id)
+        out_path = os.path.join(bdir, "output.jsonl")
+        if not os.path.exists(out_path):
+            with open(os.path.join(bdir, "input.jsonl"), "r", encoding="utf-8") as fin, \
+                    open(out_path, "w", encoding="utf-8") as fout:
+                for line in fin:
+                    if not line.strip():
+                        continue
+                    req = json.loads(line)
+                    text = self.responder(req["body"])
+                    fout.write(json.dumps({
+                        "id": "batch_req_" + uuid.uuid4().hex[:12],
+                        "custom_id": req["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {
+                                "object": "response",
+                                "status": "completed",
+                                "output": [{
+                                    "type": "message",
+                                    "role": "assistant",
+                                    "content": [{"type": "output_text", "text": text}],
+                                }],
+                            },
+                        },
+                        "error": None,
+                    }, ensure_ascii=False) + "\n")
+        return "completed"
+
+    def results(self, batch_id: str) -> Dict[str, str]:
+        with open(os.path.join(self.folder, batch_id, "output.jsonl"), "r", encoding="utf-8") as f:
+            return _parse_output_lines(f)
+
+    def cancel(self, batch_id: str) -> None:
+        pass
+
+
+# ==============================
+# JSONL writing + polling
+# ==============================
+
+def _request_line(custom_id: str, prompt: str, text_format: Optional[Dict[str, Any]] = None) -> str:
+    body = {"model": OPENAI_MODEL, "input": prompt, "temperature": TEMPERATURE}
+    if text_format:
+        body["text"] = text_format
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/responses",
+        "body": body,
+    }, ensure_ascii=False) + "\n"
+
+
+def write_batch_files(
+    requests: Dict[str, str],
+    folder: str,
+    prefix: str,
+    text_format: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """Writes {custom_id: prompt} as one or more JSONL files within the Batch API limits."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    f = None
+    count = size = 0
+    for custom_id, prompt in requests.items():
+        line = _request_line(custom_id, prompt, text_format).encode("utf-8")
+        if f is None or count >= BATCH_MAX_REQUESTS or size + len(line) > BATCH_MAX_BYTES:
+            if f is not None:
+                f.close()
+            paths.append(os.path.join(folder, f"{prefix}_{len(paths) + 1:03d}.jsonl"))
+            f = open(paths[-1], "wb")
+            count = size = 0
+        f.write(line)
+        count += 1
+        size += len(line)
+    if f is not None:
+        f.close()
+    return paths
+
+
+def _run_batches(
+    backend,
+    requests: Dict[str, str],
+    folder: str,
+    prefix: str,
+    poll_seconds: float,
+    log,
+    text_format: Optional[Dict[str, Any]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, str]:
+    if not requests or (cancel is not None and cancel.is_set()):
+        return {}
+
+    batch_ids = [backend.submit(p) for p in write_batch_files(requests, folder, prefix, text_format)]
+    log(f"{prefix}: submitted {len(requests)} requests in {len(batch_ids)} batch(es): {', '.join(batch_ids)}")
+
+    pending = set(batch_ids)
+    answers: Dict[str, str] = {}
+    while pending:
+        for batch_id in sorted(pending):
+            state = backend.status(batch_id)
+            if state not in _FINAL_STATES:
+                continue
+            pending.discard(batch_id)
+            if state != "completed":
+                log(f"{prefix}: batch {batch_id} ended with status '{state}'")
+            answers.update(backend.results(batch_id))
+        if pending:
+            if cancel is None:
+                time.sleep(poll_seconds)
+            elif cancel.wait(poll_seconds):
+                for batch_id in sorted(pending):
+                    backend.cancel(batch_id)
+                log(f"{prefix}: cancelled {len(pending)} batch(es): {', '.join(sorted(pending))}")
+                break
+
+    log(f"{prefix}: {len(answers)}/{len(requests)} answers received")
+    return answers
+
+
+# ==============================
+# Main flow
+# ==============================
+
+def run_batch(
+    pdf_paths: List[str],
+    custom_prompt: str,
+    format_prompt: str,
+    backend,
+    workdir: str,
+    poll_seconds: float = 60,
+    log: Callable[[str], None] = print,
+    known_fields: Optional[List[str]] = None,
+    extract_backend: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+) -> List[Any]:
+    """
+    Runs the two-stage extraction for all PDFs through the batch backend.
+    Returns (pdf_path, variants or exception) in input order. Setting `cancel`
+    cancels the submitted batches; PDFs still waiting for answers fail.
+    """
+    results: List[Optional[Any]] = [None] * len(pdf_paths)
+    # custom_id "s1-<pdf>-<section>": large catalogs are split into several Stage 1 requests
+    sections_by_pdf: Dict[str, List[str]] = {}
+    tables_by_id: Dict[str, Any] = {}
+    stage1_requests: Dict[str, str] = {}
+    text_format = structured_output_format(known_fields)
+
+    for i, pdf_path in enumerate(pdf_paths):
+        try:
+            text, tables = load_pdf_tables(pdf_path, extract_backend)
+            if not tables:
+                # drawings need the vision model; those stay interactive
+                results[i] = [extract_drawing_with_vision(pdf_path)]
+                continue
+            local = try_fast_path(tables, known_fields)
+            if local is not None:
+                results[i] = local
+                continue
+            plan = plan_stage1_prompts(custom_prompt, text, tables, pdf_path)
+            sections_by_pdf[str(i)] = []
+            for j, (prompt, section_tables) in enumerate(plan):
+                custom_id = f"s1-{i}-{j}"
+                sections_by_pdf[str(i)].append(custom_id)
+                tables_by_id[custom_id] = section_tables
+                stage1_requests[custom_id] = prompt
+        except Exception as e:
+            results[i] = e
+
+    answers1 = _run_batches(backend, stage1_requests, workdir, "stage1", poll_seconds, log, text_format, cancel)
+    missing = "batch run cancelled" if cancel is not None and cancel.is_set() else None
+
+    stage1_by_id: Dict[str, List[Dict[str, Any]]] = {}
+    resolved_by_id: Dict[str, List[Dict[str, Any]]] = {}
+    stage2_requests: Dict[str, str] = {}
+    for i, custom_ids in sections_by_pdf.items():
+        if any(c not in answers1 for c in custom_ids):
+            results[int(i)] = RuntimeError(missing or "no Stage 1 answer in batch output")
+            continue
+        try:
+            stage1 = merge_stage1_sections([parse_stage1(answers1[c], tables_by_id[c]) for c in custom_ids])
+        except ValueError as e:
+            # no retry round in batch mode: the PDF is reported as failed
+            stats.incr("parse_failures")
+            results[int(i)] = e
+            continue
+        except Exception as e:
+            results[int(i)] = e
+            continue
+        if not stage1:
+            results[int(i)] = []
+            continue
+        resolved, unresolved = run_local_stage2(stage1, known_fields)
+        if not unresolved:
+            results[int(i)] = merge_stage2(resolved, [])
+            continue
+        resolved_by_id[i] = resolved
+        stage1_by_id[i] = unresolved
+        stage2_requests[f"s2-{i}"] = build_stage2_prompt(format_prompt, unresolved)
+
+    answers2 = _run_batches(backend, stage2_requests, workdir, "stage2", poll_seconds, log, text_format, cancel)
+    missing = "batch run cancelled" if cancel is not None and cancel.is_set() else None
+
+    for custom_id in stage2_requests:
+        i = custom_id[3:]
+        if custom_id not in answers2:
+            results[int(i)] = RuntimeError(missing or "no Stage 2 answer in batch output")
+            continue
+        try:
+            results[int(i)] = merge_stage2(resolved_by_id[i], parse_stage2(answers2[custom_id], stage1_by_id[i]))
+        except ValueError as e:
+            stats.incr("parse_failures")
+            results[int(i)] = e
+        except Exception as e:
+            results[int(i)] = e
+
+    return list(zip(pdf_paths, results))
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    from pdf_to_prompt_variants import generate_extraction_prompt_for_pdf, generate_format_prompt_for_variants
+
+    parser = argparse.ArgumentParser(description="Two-stage variant extraction via the Batch API")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--local", action="store_true", help="use the file-based local batch backend")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--poll", type=float, default=60)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="batch_")
+    if args.local:
+        backend = LocalBatchBackend(os.path.join(workdir, "local_backend"))
+    else:
+        from process_api_variants import client
+        backend = OpenAIBatchBackend(client)
+
+    for pdf_path, variants in run_batch(
+        args.pdfs,
+        generate_extraction_prompt_for_pdf(),
+        generate_format_prompt_for_variants(),
+        backend,
+        workdir,
+        poll_seconds=args.poll,
+    ):
+        print(pdf_path, json.dumps(variants, ensure_ascii=False) if not isinstance(variants, Exception) else repr(variants))
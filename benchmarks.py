@@ -0,0 +1,874 @@
+#!/usr/bin/env python3
+"""
+benchmarks.py
+
+Local performance benchmarks. Run against your own PDFs, e.g.:
+
+    python benchmarks.py extract catalogs/*.pdf --workers 1 2 4
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from export import append_to_csv, export_to_csv
+from extract import EXTRACTION_BACKENDS, extract_pdf_content, _extract_page_range, _page_count
+
+# ============================================================
+# extract: serial vs. process-pool page extraction
+# ============================================================
+
+def bench_extract(pdf_paths: List[str], worker_counts: List[int], repeat: int) -> None:
+    print(f"{'PDF':40} {'pages':>6} {'workers':>8} {'seconds':>9} {'pages/s':>9} {'identical':>10}")
+    for pdf_path in pdf_paths:
+        n_pages = _page_count(pdf_path)
+        reference = None
+        for workers in worker_counts:
+            best = None
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                result = extract_pdf_content(pdf_path, workers=workers)
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            if reference is None:
+                reference = result
+            name = pdf_path[-40:]
+            print(f"{name:40} {n_pages:>6} {workers:>8} {best:>9.2f} {n_pages / best:>9.1f} {str(result == reference):>10}")
+
+# ============================================================
+# prescan: table pre-scan vs. full table extraction (speed + accuracy)
+# ============================================================
+
+def _curve_table_pdf(out_path: str) -> None:
+    """A one-page PDF whose 3x3 DN/d1/L table is ruled with curves only (no lines or rects)."""
+    cells = [["DN", "d1", "L"], ["15", "30", "45"], ["20", "40", "60"]]
+    xs, ys = [100, 200, 300, 400], [700, 670, 640, 610]
+    ops = ["0.5 w"]
+    # straight Bezier segments: control points on the segment, as some CAD exports write them
+    for y in ys:
+        ops.append(f"{xs[0]} {y} m {xs[1]} {y} {xs[2]} {y} {xs[3]} {y} c S")
+    for x in xs:
+        ops.append(f"{x} {ys[0]} m {x} {ys[1]} {x} {ys[2]} {x} {ys[3]} c S")
+    for r, row in enumerate(cells):
+        for c, text in enumerate(row):
+            ops.append(f"BT /F1 11 Tf {xs[c] + 10} {ys[r] - 20} Td ({text}) Tj ET")
+    stream = "\n".join(ops).encode("latin-1")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(out_path, "wb") as f:
+        f.write(out)
+
+
+def bench_prescan(pdf_paths: List[str]) -> bool:
+    # is_meaningful_table lives next to the OpenAI client; no request is made here
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from process_api_variants import is_meaningful_table
+
+    def meaningful(tables):
+        return [t for t in tables if is_meaningful_table(t)]
+
+    # always checked as well: tables ruled with curves must not be skipped
+    tmp = tempfile.mkdtemp(prefix="bench-prescan-")
+    curve_pdf = os.path.join(tmp, "curve_ruled_table.pdf")
+    _curve_table_pdf(curve_pdf)
+
+    print(f"{'PDF':40} {'pages':>6} {'skipped':>8} {'full s':>8} {'prescan s':>10} {'missed':>7}")
+    total_pages = total_skipped = total_missed = 0
+    for pdf_path in list(pdf_paths) + [curve_pdf]:
+        t0 = time.perf_counter()
+        full = _extract_page_range(pdf_path, prescan=False)
+        t_full = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        fast = _extract_page_range(pdf_path, prescan=True)
+        t_fast = time.perf_counter() - t0
+
+        skipped = sum(1 for _, _, s in fast if s)
+        # pages where the full scan found a usable table that the pre-scan lost
+        missed = [i + 1 for i, (f, p) in enumerate(zip(full, fast)) if meaningful(f[1]) != meaningful(p[1])]
+        total_pages += len(full)
+        total_skipped += skipped
+        total_missed += len(missed)
+        print(f"{pdf_path[-40:]:40} {len(full):>6} {skipped:>8} {t_full:>8.2f} {t_fast:>10.2f} {len(missed):>7}")
+        if missed:
+            print(f"  pages with different tables: {missed}")
+
+    print(f"total: {total_skipped} of {total_pages} pages skipped, {total_missed} pages with different tables")
+    os.remove(curve_pdf)
+    os.rmdir(tmp)
+    return total_missed == 0
+
+# ============================================================
+# backends: extraction backends vs. pdfplumber (throughput + tables)
+# ============================================================
+
+def _cell_counts(tables) -> Counter:
+    return Counter(" ".join(str(c).split()) for t in tables for row in t for c in row if c not in (None, ""))
+
+
+def table_equivalence(reference, candidate) -> float:
+    """F1 over the cell values of two table lists (1.0 = same cells, 0.0 = nothing shared)."""
+    ref, cand = _cell_counts(reference), _cell_counts(candidate)
+    if not ref and not cand:
+        return 1.0
+    common = sum((ref & cand).values())
+    if not common:
+        return 0.0
+    precision, recall = common / sum(cand.values()), common / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def bench_backends(pdf_paths: List[str], backends: List[str]) -> None:
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from process_api_variants import is_meaningful_table
+
+    def meaningful(data):
+        return [t for t in data["tables"] if is_meaningful_table(t)]
+
+    print(f"{'PDF':34} {'backend':>11} {'pages':>6} {'pages/s':>8} {'tables':>7} {'cell F1':>8} {'identical':>10}")
+    totals = {b: [0, 0.0, 0.0] for b in backends}  # pages, seconds, F1 sum
+    for pdf_path in pdf_paths:
+        reference = None
+        for backend in ["pdfplumber"] + [b for b in backends if b != "pdfplumber"]:
+            t0 = time.perf_counter()
+            data = extract_pdf_content(pdf_path, backend=backend)
+            elapsed = time.perf_counter() - t0
+            tables = meaningful(data)
+            if reference is None:
+                reference = tables
+            score = table_equivalence(reference, tables)
+            if backend in totals:
+                totals[backend][0] += data["pages"]
+                totals[backend][1] += elapsed
+                totals[backend][2] += score
+            print(f"{pdf_path[-34:]:34} {backend:>11} {data['pages']:>6} {data['pages'] / elapsed:>8.1f} "
+                  f"{len(tables):>7} {score:>8.2f} {str(tables == reference):>10}")
+
+    for backend, (pages, seconds, f1) in totals.items():
+        print(f"{backend}: {pages / seconds:.1f} pages/s overall, mean cell F1 vs pdfplumber {f1 / len(pdf_paths):.2f}")
+
+# ============================================================
+# memory: peak extraction memory vs. page count (tracemalloc)
+# ============================================================
+
+def _repeat_pages(pdf_path: str, n_pages: int, out_path: str) -> None:
+    import pypdfium2 as pdfium
+    src = pdfium.PdfDocument(pdf_path)
+    dest = pdfium.PdfDocument.new()
+    indexes = [i % len(src) for i in range(n_pages)]
+    dest.import_pages(src, indexes)
+    dest.save(out_path)
+    dest.close()
+    src.close()
+
+
+def bench_memory(pdf_path: str, page_counts: List[int], max_growth: float) -> bool:
+    """
+    Extracts copies of `pdf_path` repeated to each page count and compares the
+    tracemalloc peak minus the memory still held by the result (the working
+    set). Returns True if the largest working set stays within `max_growth`
+    times the smallest.
+    """
+    folder = tempfile.mkdtemp(prefix="memory-bench-")
+    print(f"{'pages':>6} {'peak MB':>9} {'result MB':>10} {'working MB':>11}")
+    working = []
+    for n in page_counts:
+        path = os.path.join(folder, f"pages_{n}.pdf")
+        _repeat_pages(pdf_path, n, path)
+        tracemalloc.start()
+        result = extract_pdf_content(path, workers=1)
+        gc.collect()  # leave only what the result really holds in "current"
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        working.append(peak - current)
+        print(f"{n:>6} {peak / 2**20:>9.1f} {current / 2**20:>10.1f} {(peak - current) / 2**20:>11.1f}")
+
+    growth = max(working) / max(min(working), 1)
+    flat = growth <= max_growth
+    print(f"working set growth {growth:.2f}x from {page_counts[0]} to {page_counts[-1]} pages: "
+          f"{'flat' if flat else 'NOT flat'} (limit {max_growth:.1f}x)")
+    return flat
+
+# ============================================================
+# csv-append: incremental global CSV vs. read-all-rewrite
+# ============================================================
+
+def _fake_rows(start: int, n: int, n_columns: int, manufacturer: str = "Bench") -> List[Dict[str, Any]]:
+    return [
+        dict(
+            {"Manufacturer": manufacturer, "Source PDF": f"datasheet_{(start + i) // 50}.pdf", "DN": str(15 + i % 8 * 5)},
+            **{f"Field {c}": f"{(start + i) * c % 997} bar, {c}" for c in range(n_columns)},
+        )
+        for i in range(n)
+    ]
+
+
+def _legacy_append(rows: List[Dict[str, Any]], path: str) -> None:
+    # what _run_manufacturer did before: read everything, extend, rewrite
+    import pandas as pd
+    old = pd.read_csv(path, dtype=str, keep_default_na=False).to_dict(orient="records") if os.path.exists(path) else []
+    pandas_export_to_csv(old + rows, path)
+
+
+def bench_csv_append(total_rows: int, batch: int, n_columns: int, legacy_rows: int, max_growth: float) -> bool:
+    """
+    Appends `total_rows` rows in batches of `batch` and reports the cost per
+    append as the file grows, then one header migration (new column) over the
+    full file. Returns True if the late appends cost at most `max_growth` times
+    the early ones.
+    """
+    folder = tempfile.mkdtemp(prefix="csv-append-bench-")
+    path = os.path.join(folder, "global.csv")
+    checkpoints = {batch * 2 ** k for k in range(64) if batch * 2 ** k < total_rows} | {total_rows}
+
+    print(f"{'rows in file':>13} {'file MB':>8} {'ms/append':>10}")
+    window, first, last = [], None, None
+    written = 0
+    while written < total_rows:
+        rows = _fake_rows(written, min(batch, total_rows - written), n_columns)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            append_to_csv(rows, path)
+        window.append(time.perf_counter() - t0)
+        written += len(rows)
+        if written in checkpoints or written >= total_rows:
+            ms = sum(window) / len(window) * 1000
+            if first is None and written > batch:  # the first append creates the file via export_to_csv
+                first = ms
+            last = ms
+            print(f"{written:>13} {os.path.getsize(path) / 2**20:>8.1f} {ms:>10.2f}")
+            window = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        append_to_csv([{"Manufacturer": "Bench", "New column": "x"}], path)
+        elapsed = time.perf_counter() - t0
+        # a second migration under tracemalloc (which slows it down) for the peak
+        tracemalloc.start()
+        append_to_csv([{"Manufacturer": "Bench", "Other column": "y"}], path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"header migration over {written} rows: {elapsed:.1f}s, peak {peak / 2**20:.1f} MB (streamed)")
+
+    if legacy_rows:
+        print(f"read-all-rewrite (before), same batches up to {legacy_rows} rows:")
+        legacy_path = os.path.join(folder, "legacy.csv")
+        written = 0
+        while written < legacy_rows:
+            rows = _fake_rows(written, min(batch, legacy_rows - written), n_columns)
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                _legacy_append(rows, legacy_path)
+            elapsed = time.perf_counter() - t0
+            written += len(rows)
+            if written in checkpoints or written >= legacy_rows:
+                print(f"{written:>13} {os.path.getsize(legacy_path) / 2**20:>8.1f} {elapsed * 1000:>10.2f}")
+
+    growth = last / first
+    flat = growth <= max_growth
+    print(f"append cost growth {growth:.2f}x from {2 * batch} to {total_rows} rows: "
+          f"{'constant' if flat else 'NOT constant'} (limit {max_growth:.1f}x)")
+    return flat
+
+# ============================================================
+# csv-export: streaming export_to_csv vs. the former pandas path
+# ============================================================
+
+def pandas_export_to_csv(rows: List[Dict[str, Any]], output_path: str, column_order=None, priority_cols=None) -> None:
+    """export_to_csv as it was before the streaming writer (reference for byte equality)."""
+    import pandas as pd
+    from export import DEFAULT_PRIORITY
+
+    seen, seen_set = [], set()
+    for r in rows:
+        for k in r.keys():
+            if k not in seen_set:
+                seen.append(k)
+                seen_set.add(k)
+    ordered = []
+    for k in priority_cols or DEFAULT_PRIORITY:
+        if k in seen_set and k not in ordered:
+            ordered.append(k)
+    for k in column_order or []:
+        if k in seen_set and k not in ordered:
+            ordered.append(k)
+    for k in seen:
+        if k not in ordered:
+            ordered.append(k)
+
+    normalized = [{k: "N/A" if r.get(k, "N/A") is None else r.get(k, "N/A") for k in ordered} for r in rows]
+    df = pd.DataFrame(normalized, columns=ordered).fillna("N/A")
+    df.to_csv(output_path, index=False, encoding="utf-8")
+
+
+def _sparse_rows(n_rows: int, n_columns: int):
+    # registry-like data: many fields, each row filling a few of them, some numbers
+    for i in range(n_rows):
+        row = {"Manufacturer": f"M{i % 7}", "Source PDF": f"datasheet_{i // 40}.pdf", "DN": 15 + i % 8 * 5}
+        for j in range(12):
+            row[f"Field {(i * 7 + j * 31) % n_columns}"] = f"{i % 113} bar, {j}" if j % 3 else i * 0.5
+        yield row
+
+
+def _timed_peak(fn) -> tuple:
+    # timed without tracemalloc (it slows pickling and pandas down unevenly), then run again for the peak
+    gc.collect()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_csv_export(row_counts: List[int], n_columns: int) -> bool:
+    """Times the pandas path and the streaming path (list and iterator input) and checks byte equality."""
+    folder = tempfile.mkdtemp(prefix="csv-export-bench-")
+    column_order = [f"Field {c}" for c in reversed(range(n_columns))]
+    print(f"{'rows':>8} {'columns':>8} {'path':>10} {'seconds':>8} {'rows/s':>9} {'peak MB':>8} {'identical':>10}")
+    all_identical = True
+    for n in row_counts:
+        rows = list(_sparse_rows(n, n_columns))
+        ref, out, gen = (os.path.join(folder, f"{name}_{n}.csv") for name in ("pandas", "list", "iter"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs = [
+                ("pandas", ref, lambda: pandas_export_to_csv(rows, ref, column_order)),
+                ("list", out, lambda: export_to_csv(rows, out, column_order)),
+                ("iterator", gen, lambda: export_to_csv(_sparse_rows(n, n_columns), gen, column_order)),
+            ]
+            results = [(name, path) + _timed_peak(fn) for name, path, fn in runs]
+        with open(ref, "rb") as f:
+            expected = f.read()
+        for name, path, elapsed, peak in results:
+            with open(path, "rb") as f:
+                identical = f.read() == expected
+            all_identical &= identical
+            print(f"{n:>8} {n_columns:>8} {name:>10} {elapsed:>8.2f} {n / elapsed:>9.0f} {peak / 2**20:>8.1f} {str(identical):>10}")
+    return all_identical
+
+# ============================================================
+# parquet: partitioned Parquet dataset vs. the combined CSV
+# ============================================================
+
+def _dir_size(folder: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(folder) for f in files)
+
+
+def bench_parquet(n_rows: int, n_columns: int, read_columns: List[str]) -> bool:
+    """File size and read time (full / column-pruned / one manufacturer); checks the values round-trip."""
+    import csv as csv_module
+    import pandas as pd
+    from parquet_export import export_to_parquet, parquet_available, read_parquet_dataset
+
+    if not parquet_available():
+        print("pyarrow is not installed")
+        return False
+
+    folder = tempfile.mkdtemp(prefix="parquet-bench-")
+    csv_path, pq_folder = os.path.join(folder, "combined.csv"), os.path.join(folder, "parquet")
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        export_to_csv(_sparse_rows(n_rows, n_columns), csv_path)
+        csv_write = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rows = list(_sparse_rows(n_rows, n_columns))
+        export_to_parquet(rows, pq_folder)
+        pq_write = time.perf_counter() - t0
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        result = fn()
+        return time.perf_counter() - t0, result
+
+    def csv_columns():
+        # the csv module has no column pruning: every line is parsed
+        with open(csv_path, encoding="utf-8", newline="") as f:
+            reader = csv_module.reader(f)
+            header = next(reader)
+            idx = [header.index(c) for c in read_columns if c in header]
+            return [[line[i] for i in idx] for line in reader]
+
+    csv_full, df = timed(lambda: pd.read_csv(csv_path, dtype=str, keep_default_na=False))
+    csv_pruned, _ = timed(csv_columns)
+    pq_full, table = timed(lambda: read_parquet_dataset(pq_folder))
+    pq_pruned, _ = timed(lambda: read_parquet_dataset(pq_folder, columns=read_columns))
+    pq_one, one = timed(lambda: read_parquet_dataset(pq_folder, columns=read_columns, manufacturers=["M3"]))
+
+    print(f"{n_rows} rows x {n_columns + 3} columns, {len(set(r['Manufacturer'] for r in rows))} manufacturer partitions")
+    print(f"{'':24} {'CSV':>10} {'Parquet':>10}")
+    print(f"{'size MB':24} {os.path.getsize(csv_path) / 2**20:>10.1f} {_dir_size(pq_folder) / 2**20:>10.1f}")
+    print(f"{'write s':24} {csv_write:>10.2f} {pq_write:>10.2f}")
+    print(f"{'read all columns s':24} {csv_full:>10.2f} {pq_full:>10.2f}")
+    print(f"{'read ' + str(len(read_columns)) + ' columns s':24} {csv_pruned:>10.2f} {pq_pruned:>10.2f}")
+    print(f"{'... of one manufacturer s':24} {'':>10} {pq_one:>10.3f} ({one.num_rows} rows)")
+
+    # round trip: same cells, "N/A" <-> null
+    expected = {
+        (r["Manufacturer"], r["Source PDF"], str(r["DN"]), r.get(read_columns[-1], "N/A"))
+        for r in df.to_dict(orient="records")
+    }
+    got = {
+        (r["Manufacturer"], r["Source PDF"], r["DN"], "N/A" if r.get(read_columns[-1]) is None else r[read_columns[-1]])
+        for r in table.select(["Manufacturer", "Source PDF", "DN", read_columns[-1]]).to_pylist()
+    }
+    same = expected == got and table.num_rows == len(df)
+    print(f"values round-trip: {'identical' if same else 'DIFFERENT'}")
+    return same
+
+# ============================================================
+# store: SQLite variant store vs. per-PDF CSV files
+# ============================================================
+
+def bench_store(n_pdfs: int, rows_per_pdf: int, n_columns: int) -> bool:
+    """Per-PDF transaction cost, DN lookup (index vs. scanning per-PDF CSVs), upsert, CSV export."""
+    import csv as csv_module
+    from variant_store import VariantStore
+
+    folder = tempfile.mkdtemp(prefix="store-bench-")
+    store = VariantStore(os.path.join(folder, "variants.sqlite"))
+    rows = list(_sparse_rows(n_pdfs * rows_per_pdf, n_columns))
+    pdf_rows = [(r[0]["Manufacturer"], f"/pdfs/{i}.pdf", r) for i, r in
+                enumerate(rows[i:i + rows_per_pdf] for i in range(0, len(rows), rows_per_pdf))]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        for mfr, path, chunk in pdf_rows:
+            store.put_pdf(mfr, path, [dict(r, DN=str(r["DN"])) for r in chunk])
+        db_write = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        csv_paths = []
+        for mfr, path, chunk in pdf_rows:
+            csv_paths.append(os.path.join(folder, f"{mfr}__{os.path.basename(path)[:-4]}_variants.csv"))
+            export_to_csv(chunk, csv_paths[-1])
+        csv_write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    found_db = sum(1 for _ in store.rows(dn="40"))
+    db_lookup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    found_csv = 0
+    for path in csv_paths:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv_module.reader(f)
+            dn = next(reader).index("DN")
+            found_csv += sum(1 for line in reader if line[dn] == "40")
+    csv_lookup = time.perf_counter() - t0
+
+    mfr, path, chunk = pdf_rows[0]
+    store.put_pdf(mfr, path, [dict(r, DN=str(r["DN"])) for r in chunk])
+    upsert_ok = sum(n for _, _, n in store.pdfs()) == len(rows)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        store.export_csv(os.path.join(folder, "all.csv"))
+        export_all = time.perf_counter() - t0
+
+    print(f"{n_pdfs} PDFs x {rows_per_pdf} rows ({len(rows)} rows, {n_columns + 3} columns)")
+    print(f"write:  store {db_write / n_pdfs * 1000:.1f} ms/PDF (one transaction each), "
+          f"per-PDF CSV {csv_write / n_pdfs * 1000:.1f} ms/PDF")
+    print(f"DN lookup: store {db_lookup * 1000:.1f} ms ({found_db} rows, index), "
+          f"per-PDF CSVs {csv_lookup * 1000:.1f} ms ({found_csv} rows, {len(csv_paths)} files)")
+    print(f"upsert: re-storing a PDF keeps {sum(n for _, _, n in store.pdfs())} rows: {'ok' if upsert_ok else 'DUPLICATED'}")
+    print(f"global CSV export from the store: {export_all:.2f}s ({len(rows) / export_all:.0f} rows/s)")
+    store.close()
+    return upsert_ok and found_db == found_csv
+
+# ============================================================
+# registry: concurrent field registry writers (stress test)
+# ============================================================
+
+REGISTRY_SHARED = [f"Shared {i}" for i in range(40)]
+
+
+def _legacy_update_fields(folder: str, rows: List[Dict[str, Any]]) -> None:
+    # the former update_fields: read, extend, rewrite in place, no lock
+    path = os.path.join(folder, "field_registry.json")
+    reg = {"fields": []}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            reg = json.load(f)
+    seen = set(reg["fields"])
+    new = [k for r in rows for k in r if k not in seen and not seen.add(k)]
+    if new:
+        reg["fields"].extend(new)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(reg, f, ensure_ascii=False, indent=2)
+
+
+def _registry_writer(folder: str, worker: int, n_fields: int, batch: int, legacy: bool, errors) -> None:
+    from field_registry import FieldRegistry
+
+    rnd = random.Random(worker)
+    own = [f"Worker {worker} field {i}" for i in range(n_fields)]
+    registry = None if legacy else FieldRegistry(folder, flush_every=batch, flush_seconds=0.01)
+    for start in range(0, n_fields, batch):
+        rows = [{k: "x" for k in own[start:start + batch] + rnd.sample(REGISTRY_SHARED, 3)}]
+        try:
+            if legacy:
+                _legacy_update_fields(folder, rows)
+            else:
+                registry.add(rows)
+                registry.known_fields()
+        except Exception:
+            with errors.get_lock():
+                errors.value += 1
+    if registry is not None:
+        registry.flush()
+
+
+def _run_registry_writers(writers: int, n_fields: int, batch: int, legacy: bool) -> tuple:
+    folder = tempfile.mkdtemp(prefix="registry-bench-")
+    errors = multiprocessing.Value("i", 0)
+    procs = [
+        multiprocessing.Process(target=_registry_writer, args=(folder, w, n_fields, batch, legacy, errors))
+        for w in range(writers)
+    ]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t0
+
+    try:
+        with open(os.path.join(folder, "field_registry.json"), encoding="utf-8") as f:
+            fields = json.load(f)["fields"]
+    except ValueError:
+        fields = []
+    expected = {f"Worker {w} field {i}" for w in range(writers) for i in range(n_fields)}
+    lost = len(expected - set(fields))
+    duplicates = len(fields) - len(set(fields))
+    return elapsed, lost, duplicates, errors.value
+
+
+def bench_registry(writers: int, n_fields: int, batch: int, calls: int) -> bool:
+    """Many processes registering fields at once; fails if the registry loses or duplicates any."""
+    from field_registry import FieldRegistry
+
+    print(f"{writers} writer processes x {n_fields} fields each, {batch} new fields per update")
+    print(f"{'registry':>10} {'seconds':>8} {'lost':>6} {'dupes':>6} {'errors':>7}")
+    ok = True
+    for legacy in (True, False):
+        elapsed, lost, duplicates, errors = _run_registry_writers(writers, n_fields, batch, legacy)
+        name = "legacy" if legacy else "locked"
+        print(f"{name:>10} {elapsed:>8.2f} {lost:>6} {duplicates:>6} {errors:>7}")
+        if not legacy:
+            ok = not (lost or duplicates or errors)
+
+    # single process: one update + one prompt build per PDF, no new fields most of the time
+    rows = [{f"Field {i}": "x" for i in range(300)}]
+    folder = tempfile.mkdtemp(prefix="registry-bench-")
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        _legacy_update_fields(folder, rows)
+        with open(os.path.join(folder, "field_registry.json"), encoding="utf-8") as f:
+            json.load(f)
+    legacy_ms = (time.perf_counter() - t0) / calls * 1000
+    registry = FieldRegistry(tempfile.mkdtemp(prefix="registry-bench-"))
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        registry.add(rows)
+        registry.known_fields()
+    registry.flush()
+    registry_ms = (time.perf_counter() - t0) / calls * 1000
+    print(f"update + read per PDF (300 fields): legacy {legacy_ms:.2f} ms, in-memory {registry_ms:.3f} ms")
+    print("no fields lost" if ok else "REGISTRY LOST OR DUPLICATED FIELDS")
+    return ok
+
+# ============================================================
+# Local stub of the OpenAI Responses endpoint
+# ============================================================
+
+STUB_VARIANTS = [{"DN": "15", "Nennweite": "G 1/2"}, {"DN": "20", "Nennweite": "G 3/4"}]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+        text = json.dumps(STUB_VARIANTS)
+        payload = {
+            "id": "resp_stub",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "stub"),
+            "status": "completed",
+            "output": [{
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": len(str(body.get("input", ""))) // 4,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": len(text) // 4,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": 0,
+            },
+        }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """Starts the stub on a free port and points OPENAI_BASE_URL at it."""
+    handler = type("StubHandler", (_StubHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # don't let cached answers hide the network latency
+    os.environ["LLM_CACHE_MB"] = "0"
+    return server
+
+# ============================================================
+# async: serial vs. concurrent PDF processing against the stub
+# ============================================================
+
+def bench_async(pdf_paths: List[str], concurrency: int, latency: float) -> None:
+    server = start_stub_server(latency)
+    # imported late: config reads the environment set up by the stub
+    from async_pipeline import process_pdfs_concurrently
+    from pdf_to_prompt_variants import generate_extraction_prompt_for_pdf, generate_format_prompt_for_variants
+    from process_api_variants import process_with_gpt_two_calls
+
+    custom_prompt = generate_extraction_prompt_for_pdf()
+    format_prompt = generate_format_prompt_for_variants()
+
+    t0 = time.perf_counter()
+    serial = [(p, process_with_gpt_two_calls(p, custom_prompt, format_prompt)) for p in pdf_paths]
+    t_serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    concurrent = process_pdfs_concurrently(pdf_paths, custom_prompt, format_prompt, concurrency=concurrency)
+    t_concurrent = time.perf_counter() - t0
+    server.shutdown()
+
+    print(f"PDFs: {len(pdf_paths)} | stub latency: {latency:.2f}s per call")
+    print(f"serial:      {t_serial:8.2f}s")
+    print(f"concurrent:  {t_concurrent:8.2f}s (concurrency {concurrency})")
+    print(f"same results in same order: {serial == concurrent}")
+
+# ============================================================
+# pipeline: staged producer/consumer run against the stub
+# ============================================================
+
+def bench_pipeline(pdf_paths: List[str], llm_workers: int, extract_workers: int, latency: float) -> None:
+    server = start_stub_server(latency)
+    from pipeline import PdfPipeline
+    from pdf_to_prompt_variants import generate_extraction_prompt_for_pdf, generate_format_prompt_for_variants
+    from process_api_variants import process_with_gpt_two_calls
+
+    custom_prompt = generate_extraction_prompt_for_pdf()
+    format_prompt = generate_format_prompt_for_variants()
+
+    t0 = time.perf_counter()
+    serial = [(p, process_with_gpt_two_calls(p, custom_prompt, format_prompt)) for p in pdf_paths]
+    t_serial = time.perf_counter() - t0
+
+    pipeline = PdfPipeline(
+        custom_prompt,
+        format_prompt,
+        extract_workers=extract_workers,
+        stage1_workers=llm_workers,
+        stage2_workers=llm_workers,
+    )
+    results = pipeline.run(pdf_paths)
+    server.shutdown()
+
+    print(f"PDFs: {len(pdf_paths)} | stub latency: {latency:.2f}s per call")
+    print(f"serial: {t_serial:.2f}s")
+    print(pipeline.report())
+    print(f"same results in same order: {serial == results}")
+
+# ============================================================
+# render: vision fallback rendering (time, payload, peak RSS)
+# ============================================================
+
+RENDER_CONFIGS = [
+    ("poppler 300dpi png", {"renderer": "poppler", "dpi": 300}),
+    ("pdfium 300dpi png", {"dpi": 300, "max_side": 0, "grayscale": False, "fmt": "png"}),
+    ("pdfium 150dpi gray jpeg", {"dpi": 150, "max_side": 2048, "grayscale": True, "fmt": "jpeg"}),
+    ("  + render cache hit", {"dpi": 150, "max_side": 2048, "grayscale": True, "fmt": "jpeg", "cached": True}),
+]
+
+
+def _render_in_child(pdf_path: str, page_index: int, options: Dict[str, Any]):
+    # fresh process per measurement, so ru_maxrss is the peak of this render alone
+    from cache import DiskCache
+    from render import render_page, to_data_url
+
+    options = dict(options)
+    cache = None
+    if options.pop("cached", False):
+        cache = DiskCache(tempfile.mkdtemp(prefix="render-bench-"), max_bytes=1 << 30)
+        render_page(pdf_path, page_index, cache=cache, **options)
+
+    t0 = time.perf_counter()
+    url = to_data_url(*render_page(pdf_path, page_index, cache=cache, **options))
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024  # bytes on macOS, KiB elsewhere
+    return elapsed, len(url), peak
+
+
+def bench_render(pdf_paths: List[str], page_index: int) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'PDF':30} {'renderer':26} {'seconds':>8} {'payload KB':>11} {'peak RSS MB':>12}")
+    for pdf_path in pdf_paths:
+        for label, options in RENDER_CONFIGS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                try:
+                    elapsed, size, peak = pool.submit(_render_in_child, pdf_path, page_index, options).result()
+                except Exception as e:
+                    print(f"{pdf_path[-30:]:30} {label:26} unavailable ({type(e).__name__}: {e})"[:110])
+                    continue
+            print(f"{pdf_path[-30:]:30} {label:26} {elapsed:>8.3f} {size / 1024:>11.0f} {peak / 1024:>12.0f}")
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PDF batch processor benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("extract", help="serial vs. parallel page extraction (pages/s)")
+    p.add_argument("pdfs", nargs="+")
+    p.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("prescan", help="table pre-scan vs. full table extraction: time and missed tables")
+    p.add_argument("pdfs", nargs="*")
+
+    p = sub.add_parser("backends", help="extraction backends vs. pdfplumber: pages/s and table equivalence")
+    p.add_argument("pdfs", nargs="+")
+    p.add_argument("--backends", nargs="+", default=list(EXTRACTION_BACKENDS), choices=list(EXTRACTION_BACKENDS))
+
+    p = sub.add_parser("memory", help="peak extraction memory as the page count grows (tracemalloc)")
+    p.add_argument("pdf", help="PDF whose pages are repeated to build the test documents")
+    p.add_argument("--pages", nargs="+", type=int, default=[25, 50, 100, 200])
+    p.add_argument("--max-growth", type=float, default=1.5)
+
+    p = sub.add_parser("csv-append", help="incremental global CSV append cost as the file grows")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--batch", type=int, default=1000, help="rows per append (one manufacturer run)")
+    p.add_argument("--columns", type=int, default=20)
+    p.add_argument("--legacy-rows", type=int, default=50_000, help="also time read-all-rewrite up to this size (0 = skip)")
+    p.add_argument("--max-growth", type=float, default=2.0)
+
+    p = sub.add_parser("csv-export", help="streaming export_to_csv vs. the former pandas path (speed, memory, bytes)")
+    p.add_argument("--rows", nargs="+", type=int, default=[1000, 10000, 50000])
+    p.add_argument("--columns", type=int, default=400)
+
+    p = sub.add_parser("parquet", help="partitioned Parquet dataset vs. combined CSV: size and read time")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--columns", type=int, default=400)
+    p.add_argument("--read-columns", nargs="+", default=["DN", "Field 7"])
+
+    p = sub.add_parser("store", help="SQLite variant store vs. per-PDF CSVs: writes, DN lookup, upsert")
+    p.add_argument("--pdfs", type=int, default=2000)
+    p.add_argument("--rows", type=int, default=25, help="rows per PDF")
+    p.add_argument("--columns", type=int, default=400)
+
+    p = sub.add_parser("registry", help="stress test: concurrent processes updating the field registry")
+    p.add_argument("--writers", type=int, default=16)
+    p.add_argument("--fields", type=int, default=200, help="new fields per writer")
+    p.add_argument("--batch", type=int, default=5, help="new fields per update")
+    p.add_argument("--calls", type=int, default=1000, help="single-process updates for the timing comparison")
+
+    p = sub.add_parser("async", help="serial vs. concurrent processing against a local stub server")
+    p.add_argument("pdfs", nargs="+")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--latency", type=float, default=0.5)
+
+    p = sub.add_parser("pipeline", help="staged pipeline with per-stage metrics against a local stub server")
+    p.add_argument("pdfs", nargs="+")
+    p.add_argument("--llm-workers", type=int, default=4)
+    p.add_argument("--extract-workers", type=int, default=2)
+    p.add_argument("--latency", type=float, default=0.5)
+
+    p = sub.add_parser("render", help="vision fallback rendering: poppler vs. in-process pdfium")
+    p.add_argument("pdfs", nargs="+")
+    p.add_argument("--page", type=int, default=0, help="0-based page index")
+
+    args = parser.parse_args()
+    if args.cmd == "extract":
+        bench_extract(args.pdfs, args.workers, args.repeat)
+    elif args.cmd == "prescan":
+        sys.exit(0 if bench_prescan(args.pdfs) else 1)
+    elif args.cmd == "backends":
+        bench_backends(args.pdfs, args.backends)
+    elif args.cmd == "memory":
+        sys.exit(0 if bench_memory(args.pdf, args.pages, args.max_growth) else 1)
+    elif args.cmd == "csv-append":
+        sys.exit(0 if bench_csv_append(args.rows, args.batch, args.columns, args.legacy_rows, args.max_growth) else 1)
+    elif args.cmd == "csv-export":
+        sys.exit(0 if bench_csv_export(args.rows, args.columns) else 1)
+    elif args.cmd == "parquet":
+        sys.exit(0 if bench_parquet(args.rows, args.columns, args.read_columns) else 1)
+    elif args.cmd == "store":
+        sys.exit(0 if bench_store(args.pdfs, args.rows, args.columns) else 1)
+    elif args.cmd == "registry":
+        sys.exit(0 if bench_registry(args.writers, args.fields, args.batch, args.calls) else 1)
+    elif args.cmd == "async":
+        bench_async(args.pdfs, args.concurrency, args.latency)
+    elif args.cmd == "pipeline":
+        bench_pipeline(args.pdfs, args.llm_workers, args.extract_workers, args.latency)
+    elif args.cmd == "render":
+        bench_render(args.pdfs, args.page)
+
+
+if __name__ == "__main__":
+    main()
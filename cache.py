@@ -0,0 +1,143 @@
+# cache.py
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+_HEADER = struct.Struct("<d")  # creation time, used for TTL expiry
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """Stable hash over JSON-serializable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache, one zlib-compressed file per key.
+
+    Entries are evicted least-recently-used first once the folder grows past
+    max_bytes (a hit bumps the file mtime), and optionally expire after
+    ttl_seconds. Writes go through a temp file + rename, so concurrent
+    processes sharing the folder never see partial entries.
+    """
+
+    def __init__(self, folder: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key + ".z")
+
+    # ----- raw bytes -----
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        p = self._path(key)
+        try:
+            with open(p, "rb") as f:
+                blob = f.read()
+            (created,) = _HEADER.unpack_from(blob)
+            if self.ttl_seconds is not None and time.time() - created > self.ttl_seconds:
+                os.remove(p)
+                raise FileNotFoundError(p)
+            data = zlib.decompress(blob[_HEADER.size:])
+            os.utime(p)
+        except (OSError, struct.error, zlib.error):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        blob = _HEADER.pack(time.time()) + zlib.compress(data, 6)
+        fd, tmp = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(blob)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    # ----- JSON values -----
+
+    def get(self, key: str) -> Optional[Any]:
+        data = self.get_bytes(key)
+        return None if data is None else json.loads(data.decode("utf-8"))
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_bytes(key, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    # ----- housekeeping -----
+
+    def _entries(self):
+        out = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(".z"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, name))
+        return out
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        # shrink to 90% so we don't evict again on the very next put
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, name in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        return f"{self.hits} hits / {self.misses} misses ({ratio:.0f}% hit rate)"
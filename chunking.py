@@ -0,0 +1,107 @@
+# chunking.py
+"""
+Map-reduce helpers for catalogs too large for a single Stage 1 call.
+
+split_into_sections packs the tables into sections under a token limit
+(splitting oversized tables by rows, header repeated), each with the head
+of the PDF text for context. After Stage 1 has run on every section,
+dedupe_variants merges the rows again: rows with the same DN are merged
+when they don't contradict each other, so a variant whose dimensions and
+pressure ratings come from different sections ends up as one row.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+from prompt_compaction import count_tokens, trim_to_tokens
+
+
+def _split_table(table: List[Any], limit: int) -> List[List[Any]]:
+    header, rows = table[0], table[1:]
+    parts, current, size = [], [], count_tokens(json.dumps(header, ensure_ascii=False))
+    base = size
+    for row in rows:
+        row_tokens = count_tokens(json.dumps(row, ensure_ascii=False))
+        if current and size + row_tokens > limit:
+            parts.append([header] + current)
+            current, size = [], base
+        current.append(row)
+        size += row_tokens
+    if current:
+        parts.append([header] + current)
+    return parts
+
+
+def split_into_sections(text: str, tables: List[List[Any]], limit: int) -> List[Tuple[str, List[List[Any]]]]:
+    """
+    Groups tables (in order) into sections whose payload stays under `limit`
+    tokens. Every section gets the head of the text (a quarter of the limit).
+    """
+    head = trim_to_tokens(text or "", limit // 4)
+    table_limit = limit - count_tokens(head)
+
+    pieces = []
+    for table in tables:
+        if count_tokens(json.dumps(table, ensure_ascii=False)) > table_limit:
+            pieces.extend(_split_table(table, table_limit))
+        else:
+            pieces.append(table)
+
+    sections: List[List[List[Any]]] = []
+    current, size = [], 0
+    for piece in pieces:
+        tokens = count_tokens(json.dumps(piece, ensure_ascii=False))
+        if current and size + tokens > table_limit:
+            sections.append(current)
+            current, size = [], 0
+        current.append(piece)
+        size += tokens
+    if current:
+        sections.append(current)
+
+    return [(head, section) for section in sections]
+
+
+def _missing(v: Any) -> bool:
+    return v is None or str(v).strip() in ("", "N/A")
+
+
+def _compatible(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    for k, v in b.items():
+        if k in a and not _missing(v) and not _missing(a[k]) and str(a[k]).strip() != str(v).strip():
+            return False
+    return True
+
+
+def dedupe_variants(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merges rows describing the same variant: same DN and no conflicting value
+    in any shared field. Rows without a DN are only dropped if exactly duplicated.
+    Keeps first-seen order.
+    """
+    out: List[Dict[str, Any]] = []
+    by_dn: Dict[str, List[Dict[str, Any]]] = {}
+    seen_plain = set()
+
+    for r in rows:
+        dn = r.get("DN")
+        if _missing(dn):
+            key = json.dumps(r, sort_keys=True, ensure_ascii=False, default=str)
+            if key not in seen_plain:
+                seen_plain.add(key)
+                out.append(r)
+            continue
+
+        candidates = by_dn.setdefault(str(dn).strip(), [])
+        for existing in candidates:
+            if _compatible(existing, r):
+                for k, v in r.items():
+                    if k not in existing or (_missing(existing[k]) and not _missing(v)):
+                        existing[k] = v
+                break
+        else:
+            merged = dict(r)
+            candidates.append(merged)
+            out.append(merged)
+
+    return out
@@ -7,6 +7,123 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5.4")
 
+# Tables scoring at least this confidence are converted locally, skipping both
+# LLM stages (set above 1 to always use the LLM)
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.85"))
+
+# Stage 2 runs locally (field registry + alias table) for rows that validate;
+# only unresolved rows go to the LLM. FIELD_ALIASES_FILE: JSON {"alias": "Field"}
+LOCAL_STAGE2 = os.getenv("LOCAL_STAGE2", "1") == "1"
+FIELD_ALIASES_FILE = os.getenv("FIELD_ALIASES_FILE", "")
+
+# Compact the Stage 1 payload (merge continuation tables, drop boilerplate and
+# text already covered by tables) and cut the text to fit the token budget
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1") == "1"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "60000"))
+
+# Stage 1 prompts above this many tokens are split into sections that run in
+# parallel (CHUNK_WORKERS) and are merged afterwards (0 = never split)
+CHUNK_TOKEN_LIMIT = int(os.getenv("CHUNK_TOKEN_LIMIT", "40000"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+
+# Optional API endpoint override (e.g. a local stub server for testing)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# How the GUI processes a manufacturer's PDFs:
+#   serial   - one PDF after another
+#   async    - concurrent asyncio pipeline (LLM_CONCURRENCY)
+#   pipeline - threaded extract/LLM/export stages (PIPELINE_*)
+#   batch    - offline OpenAI Batch API (cheaper, results within 24h)
+RUN_MODE = os.getenv("RUN_MODE", "serial")
+
+# async mode: max PDFs/LLM requests in flight
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Rate limits shared by all concurrent requests (0 = unlimited)
+LLM_REQUESTS_PER_MIN = int(os.getenv("LLM_REQUESTS_PER_MIN", "0"))
+LLM_TOKENS_PER_MIN = int(os.getenv("LLM_TOKENS_PER_MIN", "0"))
+
+# pipeline mode: workers per stage and bounded queue size between stages
+PIPELINE_EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "2"))
+PIPELINE_LLM_WORKERS = int(os.getenv("PIPELINE_LLM_WORKERS", "4"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# batch mode: seconds between batch status polls
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "60"))
+
+# Worker processes for PDF page extraction (1 = serial)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "1"))
+# Default PDF extraction backend: "pdfplumber" or "pdfium" (faster, simpler table
+# detection); the GUI can override it per manufacturer
+EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "pdfplumber")
+# Set to 0 to run pdfplumber table extraction on every page (no table pre-scan)
+TABLE_PRESCAN = os.getenv("TABLE_PRESCAN", "1") == "1"
+# Reuse the rows of a PDF already processed this session for copies with the same bytes
+DEDUP_PDFS = os.getenv("DEDUP_PDFS", "1") == "1"
+# Also match re-issued copies by their normalized tables. Opt-in: every PDF is
+# extracted up front (serially, before the run starts) to fingerprint it.
+# Needs the extraction cache (EXTRACT_CACHE_MB > 0)
+DEDUP_TABLES = os.getenv("DEDUP_TABLES", "0") == "1"
+
+# Set to 1 to also write each manufacturer's rows to a Parquet dataset partitioned
+# by manufacturer (<output folder>/PARQUET_DIR, needs pyarrow)
+PARQUET_EXPORT = os.getenv("PARQUET_EXPORT", "0") == "1"
+PARQUET_DIR = os.getenv("PARQUET_DIR", "parquet")
+
+# SQLite result database in the output folder ("" = off). Re-processing a PDF
+# replaces its rows; the manufacturer CSVs are exported from it
+RESULT_DB = os.getenv("RESULT_DB", "variants.sqlite")
+# Also write a CSV per PDF right away (with RESULT_DB they can be exported on demand)
+PER_PDF_CSV = os.getenv("PER_PDF_CSV", "0") == "1"
+
+# On-disk caches (extraction results etc.)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdf-batch-processor"))
+# Size limit of the extraction cache in MB (0 = disabled)
+EXTRACT_CACHE_MB = int(os.getenv("EXTRACT_CACHE_MB", "500"))
+# LLM response cache: size limit in MB (0 = disabled) and max age of an entry
+LLM_CACHE_MB = int(os.getenv("LLM_CACHE_MB", "200"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+# Set to 1 to ignore cached LLM answers (fresh answers are still stored)
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+
+# Set to 1 to request JSON-schema structured output (schema built from the field registry)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "0") == "1"
+# Extra attempts for an LLM answer that cannot be parsed even after repair
+PARSE_RETRIES = int(os.getenv("PARSE_RETRIES", "1"))
+
+# Set to 1 to stream Stage 1 answers and start Stage 2 on the first complete variants
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+# streaming: unresolved rows per early Stage 2 call
+STREAM_STAGE2_ROWS = int(os.getenv("STREAM_STAGE2_ROWS", "25"))
+
+# Vision fallback rendering: "pdfium" (in-process) or "poppler" (pdf2image, legacy)
+VISION_RENDERER = os.getenv("VISION_RENDERER", "pdfium")
+VISION_DPI = int(os.getenv("VISION_DPI", "150"))
+# longest image side in pixels (0 = no cap)
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "2048"))
+VISION_GRAYSCALE = os.getenv("VISION_GRAYSCALE", "1") == "1"
+# "jpeg" or "png" (optimized)
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg")
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+# Rendered page cache size in MB (0 = disabled)
+RENDER_CACHE_MB = int(os.getenv("RENDER_CACHE_MB", "200"))
+
+# Drawing PDFs: pages sent to the vision model, "1", "all" or a list like "1,3-5"
+VISION_PAGES = os.getenv("VISION_PAGES", "1")
+# concurrent vision calls per drawing PDF (rate limited by LLM_REQUESTS/TOKENS_PER_MIN)
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", "4"))
+# pages within this dHash distance of an earlier page are skipped (-1 = never skip)
+VISION_DUPLICATE_DISTANCE = int(os.getenv("VISION_DUPLICATE_DISTANCE", "4"))
+
+# Set to 1 to OCR scanned PDFs locally (pytesseract + tesseract) before using vision
+OCR_ENABLED = os.getenv("OCR_ENABLED", "0") == "1"
+OCR_LANG = os.getenv("OCR_LANG", "deu+eng")
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "10"))
+# only PDFs with at most this many characters of embedded text count as scans
+OCR_MAX_TEXT_CHARS = int(os.getenv("OCR_MAX_TEXT_CHARS", "200"))
+# mean Tesseract word confidence (0..1) below which vision is used instead
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "0.75"))
+
 
 print("API key loaded:", bool(OPENAI_API_KEY))
 print("Model:", OPENAI_MODEL)
@@ -0,0 +1,86 @@
+# dedup.py
+"""
+Duplicate datasheet detection across manufacturers.
+
+A PDF is fingerprinted twice: by its bytes (the same file added under
+several manufacturers) and by its normalized meaningful tables (re-issued
+copies that only differ in metadata, fonts or producer). The first copy is
+processed normally; later copies reuse its rows and only get their own
+meta fields stamped by the caller.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def normalize_tables(tables) -> List[List[List[str]]]:
+    """Cells with collapsed whitespace and case folded; empty rows and tables dropped."""
+    out = []
+    for table in tables or []:
+        rows = []
+        for row in table:
+            cells = [" ".join(str(c).split()).casefold() if c is not None else "" for c in row]
+            if any(cells):
+                rows.append(cells)
+        if rows:
+            out.append(rows)
+    return out
+
+
+def table_fingerprint(tables) -> Optional[str]:
+    """Hash of the normalized tables, None for PDFs without tables (drawings, scans)."""
+    normalized = normalize_tables(tables)
+    if not normalized:
+        return None
+    payload = json.dumps(normalized, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DuplicateIndex:
+    """
+    First copy per fingerprint and its result rows, kept for the GUI session
+    so "Run ALL" finds duplicates across manufacturers.
+    """
+
+    def __init__(self):
+        # ("bytes" | "tables", fingerprint) -> (manufacturer, pdf_path) of the first copy
+        self._first: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        # (manufacturer, pdf_path) of a first copy -> its rows (copies, meta fields are re-stamped on reuse)
+        self._rows: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def match(
+        self,
+        mfr: str,
+        pdf_path: str,
+        byte_fp: str,
+        table_fp: Optional[str] = None,
+    ) -> Optional[Tuple[str, str, str]]:
+        """
+        Returns (manufacturer, pdf_path, "identical bytes" | "same tables") of
+        an earlier copy, or None after registering this PDF as a first copy.
+        The same file under another manufacturer is a copy; only the same
+        (manufacturer, pdf_path) again, i.e. a re-run, is not.
+        """
+        keys = [("bytes", byte_fp)] + ([("tables", table_fp)] if table_fp else [])
+        with self._lock:
+            for kind, fp in keys:
+                first = self._first.get((kind, fp))
+                if first is not None and first != (mfr, pdf_path):
+                    reason = "identical bytes" if kind == "bytes" else "same tables"
+                    return first[0], first[1], reason
+            for key in keys:
+                self._first.setdefault(key, (mfr, pdf_path))
+        return None
+
+    def store(self, mfr: str, pdf_path: str, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._rows[(mfr, pdf_path)] = [dict(r) for r in rows]
+
+    def rows(self, mfr: str, pdf_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Fresh copies of a first copy's rows, None if it has no result (yet)."""
+        with self._lock:
+            rows = self._rows.get((mfr, pdf_path))
+            return None if rows is None else [dict(r) for r in rows]
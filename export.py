@@ -1,6 +1,9 @@
 # export.py
-import pandas as pd
-from typing import Any, Dict, List, Union, Optional
+import csv
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Set, Union, Optional
 
 # Priority columns first in the exported CSV.
 # Keep this list stable to avoid column churn across runs.
@@ -15,56 +18,235 @@ def _as_rows(data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str
         return [r for r in data if isinstance(r, dict)]
     return []
 
-def export_to_csv(
-    data,
-    output_path: str,
-    column_order: Optional[List[str]] = None,
-    priority_cols: Optional[List[str]] = None,
-):
-    rows = _as_rows(data)
-    if not rows:
-        print("No valid data to export (empty).")
-        return
+def _iter_rows(data) -> Iterator[Dict[str, Any]]:
+    # like _as_rows, but also takes generators and other iterables of rows
+    if data is None or isinstance(data, (dict, list, str, bytes)):
+        return iter(_as_rows(data))
+    try:
+        return (r for r in iter(data) if isinstance(r, dict))
+    except TypeError:
+        return iter(())
+
 
-    # build union of keys (stable order)
-    seen = []
-    seen_set = set()
+def _first_seen_keys(rows: Iterable[Dict[str, Any]], seen: Optional[List[str]] = None) -> List[str]:
+    # union of keys (stable order), continuing `seen`
+    seen = list(seen or [])
+    seen_set = set(seen)
     for r in rows:
         for k in r.keys():
             if k not in seen_set:
                 seen.append(k)
                 seen_set.add(k)
+    return seen
+
+def _column_order(
+    seen: List[str],
+    column_order: Optional[List[str]] = None,
+    priority_cols: Optional[List[str]] = None,
+) -> List[str]:
+    seen_set = set(seen)
+    # dict as an ordered set: O(1) membership with hundreds of registry fields
+    ordered: Dict[str, None] = {}
 
     # priority first (always)
-    priority = priority_cols or DEFAULT_PRIORITY
-    ordered = []
-    for k in priority:
-        if k in seen_set and k not in ordered:
-            ordered.append(k)
+    for k in priority_cols or DEFAULT_PRIORITY:
+        if k in seen_set:
+            ordered.setdefault(k)
 
     # then: use registry order if provided
-    if column_order:
-        for k in column_order:
-            if k in seen_set and k not in ordered:
-                ordered.append(k)
+    for k in column_order or []:
+        if k in seen_set:
+            ordered.setdefault(k)
 
     # then: remaining in first-seen order
     for k in seen:
-        if k not in ordered:
-            ordered.append(k)
+        ordered.setdefault(k)
+    return list(ordered)
 
-    # normalize missing values
-    normalized = []
-    for r in rows:
-        nr = {}
-        for k in ordered:
-            v = r.get(k, "N/A")
-            if v is None:
-                v = "N/A"
-            nr[k] = v
-        normalized.append(nr)
-
-    df = pd.DataFrame(normalized, columns=ordered)
-    df = df.fillna("N/A")
-    df.to_csv(output_path, index=False, encoding="utf-8")
+def _cell(v: Any) -> Any:
+    # missing-value rule of the CSV exports: None and NaN become "N/A"
+    if v is None or (isinstance(v, float) and v != v):
+        return "N/A"
+    return v
+
+def _csv_writer(f):
+    # the dialect of pandas' to_csv, which the exports used to go through
+    return csv.writer(f, quoting=csv.QUOTE_MINIMAL, lineterminator=os.linesep)
+
+# ints outside int64 made pandas fall back to an object column
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+class _ColumnScan:
+    """
+    First pass over the rows: the keys in first-seen order, and the columns
+    pandas would have stored as float64 (only floats and int64-range ints in
+    every row), whose ints it wrote as "3.0".
+    """
+
+    def __init__(self):
+        self.keys: Dict[str, None] = {}
+        self.rows = 0
+        self._numeric: Dict[str, int] = {}
+        self._floats: Set[str] = set()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.rows += 1
+        for k, v in row.items():
+            self.keys.setdefault(k)
+            if isinstance(v, float) or (isinstance(v, int) and not isinstance(v, bool) and _INT64_MIN <= v <= _INT64_MAX):
+                self._numeric[k] = self._numeric.get(k, 0) + 1
+                if isinstance(v, float):
+                    self._floats.add(k)
+
+    def float_columns(self) -> Set[str]:
+        return {k for k in self._floats if self._numeric[k] == self.rows}
+
+def _unspool(spool, n_rows: int) -> Iterator[Dict[str, Any]]:
+    for _ in range(n_rows):
+        yield pickle.load(spool)
+
+def export_to_csv(
+    data,
+    output_path: str,
+    column_order: Optional[List[str]] = None,
+    priority_cols: Optional[List[str]] = None,
+):
+    """
+    Writes a row dict, a list of rows or any iterable of rows to CSV.
+
+    Columns are the priority columns, then `column_order`, then the remaining
+    keys in first-seen order; missing values and None/NaN are written as "N/A".
+    The rows are read twice (columns first, then the CSV is streamed out);
+    rows from a one-shot iterator are spooled to a temp file in between, so
+    no per-row copy is kept in memory. The bytes match the former pandas
+    DataFrame.to_csv path.
+    """
+    scan = _ColumnScan()
+    spool = None
+    if data is None or isinstance(data, (dict, list)):
+        rows = _as_rows(data)
+        for r in rows:
+            scan.add(r)
+    else:
+        spool = tempfile.TemporaryFile()
+        for r in _iter_rows(data):
+            scan.add(r)
+            pickle.dump(r, spool, pickle.HIGHEST_PROTOCOL)
+
+    try:
+        if not scan.rows:
+            print("No valid data to export (empty).")
+            return
+
+        if spool is not None:
+            spool.seek(0)
+            rows = _unspool(spool, scan.rows)
+
+        ordered = _column_order(list(scan.keys), column_order, priority_cols)
+        index = {k: i for i, k in enumerate(ordered)}
+        float_index = [index[k] for k in scan.float_columns()]
+        blank = ["N/A"] * len(ordered)
+
+        with open(output_path, "w", encoding="utf-8", newline="") as f:
+            writer = _csv_writer(f)
+            writer.writerow(ordered)
+            for r in rows:
+                # rows are sparse against hundreds of registry columns: fill only their keys
+                cells = blank.copy()
+                for k, v in r.items():
+                    cells[index[k]] = _cell(v)
+                for i in float_index:
+                    if cells[i] != "N/A":
+                        cells[i] = float(cells[i])
+                writer.writerow(cells)
+    finally:
+        if spool is not None:
+            spool.close()
     print(f"CSV saved: {output_path}")
+
+# ==============================
+# Incremental append (global combined CSV)
+# ==============================
+
+def _write_appended(writer, rows: List[Dict[str, Any]], header: List[str]) -> None:
+    # the new rows, formatted like export_to_csv formats them on their own
+    scan = _ColumnScan()
+    for r in rows:
+        scan.add(r)
+    float_columns = scan.float_columns()
+    float_index = [i for i, k in enumerate(header) if k in float_columns]
+    for r in rows:
+        cells = [_cell(r.get(k, "N/A")) for k in header]
+        for i in float_index:
+            if cells[i] != "N/A":
+                cells[i] = float(cells[i])
+        writer.writerow(cells)
+
+def _read_header(path: str) -> Optional[List[str]]:
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+def append_to_csv(
+    data,
+    output_path: str,
+    column_order: Optional[List[str]] = None,
+    priority_cols: Optional[List[str]] = None,
+) -> bool:
+    """
+    Appends rows to a CSV written by export_to_csv without reading it back.
+
+    Rows are appended in place while their keys fit the existing header. When
+    they bring new columns, the file is rewritten once: old rows are streamed
+    line by line into a temp file under the new header (new cells "N/A"), then
+    it replaces the original. The column order equals export_to_csv on all rows.
+    Cells are formatted per batch: the ints of a float column are written as
+    "3.0" like export_to_csv on the new rows alone. The old rows are not read
+    back, so a file built by appends is not byte-identical to one export of
+    all rows when a column is float in some batches only.
+    Returns True when the header had to be migrated.
+    """
+    rows = _as_rows(data)
+    if not rows:
+        return False
+
+    header = _read_header(output_path)
+    if not header:
+        export_to_csv(rows, output_path, column_order, priority_cols)
+        return False
+
+    keys = _first_seen_keys(rows, header)
+    if len(keys) == len(header):
+        with open(output_path, "a", encoding="utf-8", newline="") as f:
+            _write_appended(_csv_writer(f), rows, header)
+        return False
+
+    new_header = _column_order(keys, column_order, priority_cols)
+    old_index = {k: i for i, k in enumerate(header)}
+    # source index per new column, None for columns the old file does not have
+    mapping = [old_index.get(k) for k in new_header]
+
+    folder = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".csv.tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as out, \
+                open(output_path, "r", encoding="utf-8", newline="") as src:
+            writer = _csv_writer(out)
+            writer.writerow(new_header)
+            reader = csv.reader(src)
+            next(reader, None)
+            for old in reader:
+                writer.writerow([
+                    "N/A" if i is None else (old[i] if i < len(old) else "")
+                    for i in mapping
+                ])
+            _write_appended(writer, rows, new_header)
+        os.replace(tmp, output_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    print(f"CSV header migrated ({len(header)} -> {len(new_header)} columns): {output_path}")
+    return True
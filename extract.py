@@ -1,26 +1,206 @@
 import pdfplumber
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-def extract_pdf_content(pdf_path):
+from cache import DiskCache, file_sha256, make_key
+from pdfium_backend import PdfiumBackend
+
+# Table pre-scan: extract_tables() only runs on pages that can hold a table.
+# pdfplumber's default "lines" strategy builds cells from ruling edges, so a
+# page needs enough horizontal and vertical rulings (lines, rect sides) and
+# some text inside the ruled area to produce a table with a header row.
+PRESCAN_SETTINGS = {"min_h_edges": 3, "min_v_edges": 3, "min_cell_chars": 4}
+
+# Everything that changes the extraction output goes into the cache key.
+# Bump "version" whenever the extraction logic itself changes.
+EXTRACTION_SETTINGS = {"version": 2, "text": {}, "tables": {}, "prescan": PRESCAN_SETTINGS}
+
+# Below this many pages per worker the process start-up costs more than it saves.
+MIN_PAGES_PER_WORKER = 4
+
+def _page_count(pdf_path: str) -> int:
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+def is_table_candidate(page, settings: Dict[str, int] = PRESCAN_SETTINGS) -> bool:
+    """Cheap check on the page objects: can extract_tables() find anything here?"""
+    h_edges, v_edges = 0, 0
+    x0, top, x1, bottom = float("inf"), float("inf"), float("-inf"), float("-inf")
+    # the edges the "lines" table strategy uses: lines, rect sides and curve segments
+    for obj in page.edges:
+        if obj["orientation"] == "h" and abs(obj["top"] - obj["bottom"]) < 1:
+            h_edges += 1
+        elif obj["orientation"] == "v" and abs(obj["x0"] - obj["x1"]) < 1:
+            v_edges += 1
+        else:
+            continue
+        x0, top = min(x0, obj["x0"]), min(top, obj["top"])
+        x1, bottom = max(x1, obj["x1"]), max(bottom, obj["bottom"])
+
+    if h_edges < settings["min_h_edges"] or v_edges < settings["min_v_edges"]:
+        return False
+
+    # character density of the ruled area: frames and drawings without text hold no table
+    inside = 0
+    for c in page.chars:
+        if x0 <= c["x0"] and c["x1"] <= x1 and top <= c["top"] and c["bottom"] <= bottom and c["text"].strip():
+            inside += 1
+            if inside >= settings["min_cell_chars"]:
+                return True
+    return False
+
+def iter_pages(
+    pdf_path: str,
+    start: int = 0,
+    stop: Optional[int] = None,
+    prescan: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields {"page", "text", "tables", "skipped"} for pages [start, stop) one at
+    a time ("page" is 1-based). Each page's cached layout objects are released
+    before the next page is parsed, so memory stays flat on huge catalogs.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        stop = len(pdf.pages) if stop is None else min(stop, len(pdf.pages))
+        for i in range(start, stop):
+            page = pdf.pages[i]
+            try:
+                skip = prescan and not is_table_candidate(page)
+                item = {
+                    "page": i + 1,
+                    "text": page.extract_text(),
+                    "tables": [] if skip else page.extract_tables(),
+                    "skipped": skip,
+                }
+            finally:
+                page.close()
+            yield item
+
+class PdfplumberBackend:
+    """Default backend: pdfplumber text and ruling-based tables."""
+    name = "pdfplumber"
+    version = pdfplumber.__version__
+
+    def page_count(self, pdf_path: str) -> int:
+        return _page_count(pdf_path)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, stop: Optional[int] = None, prescan: bool = True):
+        return iter_pages(pdf_path, start, stop, prescan)
+
+# Every backend has page_count(pdf_path) and iter_pages(pdf_path, start, stop,
+# prescan) yielding the same per-page dicts, so the result keeps the
+# {"text", "tables"} contract whichever backend produced it.
+EXTRACTION_BACKENDS = {
+    "pdfplumber": PdfplumberBackend(),
+    "pdfium": PdfiumBackend(),
+}
+
+def get_backend(name: Optional[str] = None):
+    try:
+        return EXTRACTION_BACKENDS[name or "pdfplumber"]
+    except KeyError:
+        raise ValueError(f"Unknown extraction backend '{name}' (available: {', '.join(EXTRACTION_BACKENDS)})")
+
+def _extract_page_range(
+    pdf_path: str,
+    start: int = 0,
+    stop: Optional[int] = None,
+    prescan: bool = True,
+    backend: str = "pdfplumber",
+) -> List[Tuple[str, List[Any], bool]]:
+    """
+    Extracts (text, tables, table scan skipped) for pages [start, stop), or all
+    pages when stop is None. Also runs inside worker processes, so it opens its
+    own handle on the PDF.
+    """
+    pages = get_backend(backend).iter_pages(pdf_path, start, stop, prescan)
+    return [(p["text"], p["tables"], p["skipped"]) for p in pages]
+
+def _split_ranges(n_pages: int, workers: int) -> List[Tuple[int, int]]:
+    # a few more chunks than workers, so one dense page range does not stall the pool
+    n_chunks = min(n_pages, workers * 4)
+    size, rest = divmod(n_pages, n_chunks)
+    ranges = []
+    start = 0
+    for i in range(n_chunks):
+        stop = start + size + (1 if i < rest else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def _assemble(pages: Iterable[Tuple[str, List[Any], bool]]) -> Dict[str, Any]:
+    texts, tables_out = [], []
+    n_pages = n_skipped = 0
+    for text, tables, skipped in pages:
+        if text:
+            texts.append(text)
+        tables_out.extend(tables)
+        n_pages += 1
+        n_skipped += skipped
+    return {
+        "text": "".join(t + "\n" for t in texts),
+        "tables": tables_out,
+        "pages": n_pages,
+        "pages_skipped": n_skipped,
+    }
+
+def extraction_cache_key(pdf_path: str, prescan: bool = True, backend: str = "pdfplumber") -> str:
+    settings = dict(EXTRACTION_SETTINGS, prescan=EXTRACTION_SETTINGS["prescan"] if prescan else None)
+    if backend == "pdfplumber":
+        return make_key(file_sha256(pdf_path), pdfplumber.__version__, settings)
+    return make_key(file_sha256(pdf_path), backend, get_backend(backend).version, settings)
+
+def extract_pdf_content(
+    pdf_path,
+    workers: int = 1,
+    cache: Optional[DiskCache] = None,
+    prescan: bool = True,
+    backend: str = "pdfplumber",
+):
     """
     Extracts text and tables from a given PDF file.
 
     :param pdf_path: Path to the PDF file.
-    :return: A dictionary containing extracted text and tables.
+    :param workers: Number of worker processes. With more than one worker the pages
+        are split into ranges, extracted in parallel and reassembled in page order;
+        the result is identical to the serial path.
+    :param cache: Optional DiskCache. Results are keyed by the PDF bytes, the backend
+        version and EXTRACTION_SETTINGS, so a hit skips PDF parsing entirely.
+    :param prescan: Only run table extraction on pages that pass is_table_candidate.
+    :param backend: Name of the extraction backend (see EXTRACTION_BACKENDS).
+    :return: A dictionary containing extracted text and tables, the page count and
+        the number of pages whose table extraction was skipped.
     """
-    extracted_data = {"text": "", "tables": []}
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                extracted_data["text"] += text + "\n"
+    if cache is not None:
+        key = extraction_cache_key(pdf_path, prescan, backend)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        extracted_data = extract_pdf_content(pdf_path, workers=workers, prescan=prescan, backend=backend)
+        cache.put(key, extracted_data)
+        return extracted_data
 
-            tables = page.extract_tables()
-            for table in tables:
-                extracted_data["tables"].append(table)
+    if workers and workers > 1:
+        n_pages = get_backend(backend).page_count(pdf_path)
+        workers = min(workers, os.cpu_count() or 1, n_pages // MIN_PAGES_PER_WORKER)
+        if workers > 1:
+            ranges = _split_ranges(n_pages, workers)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = pool.map(
+                    _extract_page_range,
+                    [pdf_path] * len(ranges),
+                    [r[0] for r in ranges],
+                    [r[1] for r in ranges],
+                    [prescan] * len(ranges),
+                    [backend] * len(ranges),
+                )
+                return _assemble([p for chunk in chunks for p in chunk])
 
-    return extracted_data
+    # serial: consume the pages as they are produced, nothing per-page is kept
+    pages = get_backend(backend).iter_pages(pdf_path, prescan=prescan)
+    return _assemble((p["text"], p["tables"], p["skipped"]) for p in pages)
 
 if __name__ == "__main__":
     sample_pdf = "data/sample.pdf"
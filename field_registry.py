@@ -1,10 +1,22 @@
 # field_registry.py
+import atexit
 import json
 import os
-from typing import Dict, List, Any
+import tempfile
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+from filelock import FileLock
 
 REGISTRY_FILENAME = "field_registry.json"
 
+# write-behind: flush once this many new fields are pending, or after this many seconds
+FLUSH_EVERY = 50
+FLUSH_SECONDS = 5.0
+# seconds to wait for another process holding the registry lock
+LOCK_TIMEOUT = 60
+
 def _path(output_folder: str) -> str:
     return os.path.join(output_folder, REGISTRY_FILENAME)
 
@@ -19,41 +31,133 @@ def load_registry(output_folder: str) -> Dict[str, Any]:
     return data
 
 def save_registry(output_folder: str, registry: Dict[str, Any]) -> None:
-    p = _path(output_folder)
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(registry, f, ensure_ascii=False, indent=2)
+    # temp file + rename: readers never see a half-written registry
+    fd, tmp = tempfile.mkstemp(dir=output_folder, prefix=".field_registry-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, _path(output_folder))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
 
-def get_known_fields(output_folder: str) -> List[str]:
-    reg = load_registry(output_folder)
-    # keep insertion order exactly
-    fields = reg.get("fields", [])
-    cleaned = []
-    seen = set()
+def _clean(fields) -> Dict[str, None]:
+    # ordered set of stripped, non-empty names (a dict keeps insertion order)
+    out: Dict[str, None] = {}
     for f in fields:
         s = str(f).strip()
-        if s and s not in seen:
-            cleaned.append(s)
-            seen.add(s)
-    return cleaned
+        if s:
+            out.setdefault(s)
+    return out
+
+class FieldRegistry:
+    """
+    The field registry of one output folder, kept in memory.
+
+    Reads are served from an in-memory ordered set; the file is only re-read
+    when another process has changed it. New fields are written behind in
+    batches: flush() takes a cross-process file lock, merges the pending
+    fields into what is on disk (other workers may have added fields
+    meanwhile) and replaces the file atomically. Nobody's fields get lost and
+    the order is first-registered across all writers.
+    """
+
+    def __init__(self, output_folder: str, flush_every: int = FLUSH_EVERY, flush_seconds: float = FLUSH_SECONDS):
+        self.output_folder = output_folder
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._fields: Dict[str, None] = {}
+        self._pending: Dict[str, None] = {}
+        self._pending_since: Optional[float] = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(_path(output_folder) + ".lock", timeout=LOCK_TIMEOUT)
+        self._reload()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(_path(self.output_folder))
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except FileNotFoundError:
+            return None
+
+    def _reload(self) -> Dict[str, Any]:
+        # disk order first, then our fields the file does not have yet
+        registry = load_registry(self.output_folder)
+        self._stamp = self._file_stamp()
+        fields = _clean(registry["fields"])
+        for f in self._fields:
+            fields.setdefault(f)
+        self._fields = fields
+        return registry
+
+    def known_fields(self) -> List[str]:
+        with self._lock:
+            if self._file_stamp() != self._stamp:
+                self._reload()
+            return list(self._fields)
+
+    def add(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Registers the keys of `rows`; returns the ones not known before (in first-seen order)."""
+        new_fields = []
+        with self._lock:
+            for r in rows:
+                if not isinstance(r, dict):
+                    continue
+                for k in r.keys():
+                    ks = str(k).strip()
+                    if ks and ks not in self._fields:
+                        self._fields[ks] = None
+                        self._pending[ks] = None
+                        new_fields.append(ks)
+            if self._pending and self._pending_since is None:
+                self._pending_since = time.monotonic()
+            due = self._pending and (
+                len(self._pending) >= self.flush_every
+                or time.monotonic() - self._pending_since >= self.flush_seconds
+            )
+            if due:
+                self._flush_locked()
+        return new_fields
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        with self._file_lock:
+            registry = self._reload()
+            registry["fields"] = list(self._fields)
+            save_registry(self.output_folder, registry)
+            self._stamp = self._file_stamp()
+        self._pending.clear()
+        self._pending_since = None
+
+_registries: Dict[str, FieldRegistry] = {}
+_registries_lock = threading.Lock()
+
+def get_registry(output_folder: str) -> FieldRegistry:
+    """One FieldRegistry per output folder and process."""
+    key = os.path.abspath(output_folder)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = FieldRegistry(output_folder)
+        return _registries[key]
+
+@atexit.register
+def flush_all() -> None:
+    with _registries_lock:
+        registries = list(_registries.values())
+    for registry in registries:
+        registry.flush()
+
+def get_known_fields(output_folder: str) -> List[str]:
+    # keep insertion order exactly
+    return get_registry(output_folder).known_fields()
 
 def update_fields(output_folder: str, rows: List[Dict[str, Any]]) -> List[str]:
-    reg = load_registry(output_folder)
-    fields = reg.get("fields", [])
-    seen = set([str(x).strip() for x in fields if str(x).strip()])
-
-    new_fields = []
-    for r in rows:
-        if not isinstance(r, dict):
-            continue
-        for k in r.keys():
-            ks = str(k).strip()
-            if ks and ks not in seen:
-                seen.add(ks)
-                fields.append(ks)
-                new_fields.append(ks)
-
-    if new_fields:
-        reg["fields"] = fields
-        save_registry(output_folder, reg)
-
-    return new_fields
+    # written behind; call get_registry(output_folder).flush() to persist right away
+    return get_registry(output_folder).add(rows)
@@ -0,0 +1,41 @@
+# layout.py
+"""
+Table detection from positioned words, for sources without ruling lines
+(OCR output, pdfium text).
+
+A line's words are split into cells at wide horizontal gaps. Runs of lines
+with the same number of cells become tables, shaped like pdfplumber's
+extract_tables() output (list of rows, each a list of cell strings).
+"""
+
+from statistics import median
+from typing import Any, Dict, List
+
+# a gap wider than this many word heights starts a new cell
+CELL_GAP_FACTOR = 1.5
+
+
+def split_cells(words: List[Dict[str, Any]], gap_factor: float = CELL_GAP_FACTOR) -> List[str]:
+    """Cells of one line; `words` are {"text", "left", "width", "height"} sorted by left."""
+    gap = gap_factor * median(w["height"] for w in words)
+    cells, current = [], [words[0]["text"]]
+    for prev, word in zip(words, words[1:]):
+        if word["left"] - (prev["left"] + prev["width"]) > gap:
+            cells.append(" ".join(current))
+            current = []
+        current.append(word["text"])
+    cells.append(" ".join(current))
+    return cells
+
+
+def find_tables(rows: List[List[str]]) -> List[List[List[str]]]:
+    """Runs of at least two consecutive lines with the same number (>= 2) of cells."""
+    tables, current = [], []
+    for cells in rows + [[]]:
+        if len(cells) >= 2 and (not current or len(cells) == len(current[0])):
+            current.append(cells)
+            continue
+        if len(current) >= 2:
+            tables.append(current)
+        current = [cells] if len(cells) >= 2 else []
+    return tables
@@ -0,0 +1,147 @@
+# normalizer.py
+"""
+Local replacement for the Stage 2 LLM normalizer.
+
+Does what generate_format_prompt_for_variants asks the model to do, with
+rules instead of a round trip: alias keys (Nennweite, Nominal size, ...) map
+to their canonical name, keys must match the field registry,
+values become strings and missing values become 'N/A'. A row only counts as
+resolved if all of its keys end up as known registry fields and it has a DN;
+everything else is left for the LLM.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# alias (case-insensitive) -> canonical field name
+DEFAULT_ALIASES = {
+    "nennweite": "DN",
+    "nennweite dn": "DN",
+    "nominal size": "DN",
+    "nominal diameter": "DN",
+    "nominal width": "DN",
+    "dn": "DN",
+}
+
+# meta fields stamped by the GUI, always allowed
+META_FIELDS = {"Manufacturer", "Source PDF", "Source PDF Path"}
+
+
+def _ws(s: Any) -> str:
+    return " ".join(str(s).split())
+
+
+def _norm(s: Any) -> str:
+    return _ws(s).lower()
+
+
+def load_aliases(path: Optional[str] = None) -> Dict[str, str]:
+    """DEFAULT_ALIASES, extended/overridden by a JSON file {"alias": "Canonical"}."""
+    aliases = dict(DEFAULT_ALIASES)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for alias, canonical in data.items():
+            aliases[_norm(alias)] = str(canonical).strip()
+    return aliases
+
+
+def _value(v: Any) -> Optional[str]:
+    if v is None:
+        return "N/A"
+    if isinstance(v, (dict, list)):
+        return None
+    s = str(v).strip()
+    return s if s else "N/A"
+
+
+def normalize_row_locally(
+    row: Dict[str, Any],
+    known_fields: Dict[str, str],
+    aliases: Dict[str, str],
+) -> Optional[Dict[str, str]]:
+    """Returns the normalized row, or None if the row needs the LLM."""
+    out: Dict[str, str] = {}
+    for k, v in row.items():
+        value = _value(v)
+        if value is None:
+            return None
+
+        # registry names are case-sensitive on purpose: d1 and D1 are different dimensions
+        key = aliases.get(_norm(k)) or known_fields.get(_ws(k))
+        if key is None:
+            return None
+
+        # two source keys landing on one field (e.g. DN + Nennweite) must agree
+        prev = out.get(key)
+        if prev is not None and prev != "N/A" and value != "N/A" and prev != value:
+            return None
+        if prev is None or prev == "N/A":
+            out[key] = value
+
+    if out.get("DN", "N/A") == "N/A":
+        return None
+    return out
+
+
+def _known_fields(known_fields: Optional[List[str]]) -> Dict[str, str]:
+    known = {_ws(f): f for f in (known_fields or [])}
+    for f in META_FIELDS | {"DN"}:
+        known.setdefault(f, f)
+    return known
+
+
+def normalize_rows_locally(
+    rows: List[Dict[str, Any]],
+    known_fields: Optional[List[str]],
+    aliases: Dict[str, str],
+) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+    """Splits Stage 1 rows into (resolved locally, unresolved for the LLM)."""
+    known = _known_fields(known_fields)
+    resolved, unresolved = [], []
+    for r in rows:
+        nr = normalize_row_locally(r, known, aliases)
+        if nr is None:
+            unresolved.append(r)
+        else:
+            resolved.append(nr)
+    return resolved, unresolved
+
+
+def canonicalize_rows(
+    rows: List[Dict[str, Any]],
+    known_fields: Optional[List[str]],
+    aliases: Dict[str, str],
+) -> List[Dict[str, Any]]:
+    """
+    The key mapping of normalize_row_locally for rows that never reach the
+    LLM (the table fast path), without giving up on a row: alias and registry
+    names where they apply, other keys kept (new fields). A value that
+    conflicts with the one already mapped to its field stays under its own key.
+    """
+    known = _known_fields(known_fields)
+    out = []
+    for r in rows:
+        nr: Dict[str, Any] = {}
+        for k, v in r.items():
+            value = _value(v)
+            if value is None:
+                value = v
+            key = aliases.get(_norm(k)) or known.get(_ws(k)) or _ws(k)
+            prev = nr.get(key)
+            if prev is None or prev == "N/A":
+                nr[key] = value
+            elif value != "N/A" and value != prev:
+                nr[_ws(k)] = value
+        out.append(nr)
+    return out
+
+
+def harmonize_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Same keys on every row (first-seen order), 'N/A' where a row has no value."""
+    keys: Dict[str, None] = {}
+    for r in rows:
+        for k in r:
+            keys.setdefault(k, None)
+    return [{k: r.get(k, "N/A") for k in keys} for r in rows]
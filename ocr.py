@@ -0,0 +1,78 @@
+# ocr.py
+"""
+Local OCR for scanned datasheets (optional: needs pytesseract and the
+tesseract binary).
+
+Pages are rendered with pdfium and read with Tesseract. Words are grouped
+back into lines and tables are rebuilt with layout.find_tables. The mean
+word confidence tells the caller whether the result can be trusted or the
+vision model is needed.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from layout import find_tables, split_cells
+from render import page_count, render_image
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+
+def ocr_available() -> bool:
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def _lines(data: Dict[str, List[Any]]) -> Tuple[List[List[Dict[str, Any]]], List[float]]:
+    """Words grouped by (block, paragraph, line) in reading order, plus their confidences."""
+    lines: Dict[Tuple[int, int, int], List[Dict[str, Any]]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        confidences.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append({
+            "text": word,
+            "left": data["left"][i],
+            "width": data["width"][i],
+            "height": data["height"][i],
+        })
+    ordered = [sorted(words, key=lambda w: w["left"]) for _, words in sorted(lines.items())]
+    return ordered, confidences
+
+
+def ocr_pdf(
+    pdf_path: str,
+    lang: str = "deu+eng",
+    dpi: int = 300,
+    max_pages: int = 10,
+) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"text", "tables", "confidence"} (confidence 0..1), or None when
+    OCR is not available.
+    """
+    if not ocr_available():
+        return None
+
+    texts, tables, confidences = [], [], []
+    for page_index in range(min(page_count(pdf_path), max_pages)):
+        image = render_image(pdf_path, page_index, dpi=dpi, max_side=0, grayscale=True)
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+        lines, page_conf = _lines(data)
+        confidences.extend(page_conf)
+        rows = [split_cells(words) for words in lines]
+        texts.append("\n".join(" ".join(cells) for cells in rows))
+        tables.extend(find_tables(rows))
+
+    confidence = sum(confidences) / len(confidences) / 100 if confidences else 0.0
+    return {"text": "\n".join(texts), "tables": tables, "confidence": confidence}
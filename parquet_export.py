@@ -0,0 +1,135 @@
+# parquet_export.py
+"""
+Columnar export next to the CSVs (optional: needs pyarrow).
+
+Rows go into a Parquet dataset partitioned by manufacturer
+(<folder>/Manufacturer=<name>/part-*.parquet, hive style). Every column is
+a dictionary-encoded string column, and missing values ("N/A", None, NaN)
+are real nulls. Each file carries the columns known when it was written.
+read_parquet_dataset() unifies the file schemas, so columns added to the
+field registry later read as null in older files.
+"""
+
+import glob
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from export import _column_order, _first_seen_keys, _iter_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+PARTITION_COLUMN = "Manufacturer"
+# directory value for rows without a manufacturer (pyarrow's hive default)
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+MISSING = "N/A"
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _value(v: Any) -> Optional[str]:
+    if v is None or v == MISSING or (isinstance(v, float) and v != v):
+        return None
+    return v if isinstance(v, str) else str(v)
+
+
+def rows_to_table(rows: List[Dict[str, Any]], columns: List[str]) -> "pa.Table":
+    """One dictionary<int32, string> column per name in `columns`; missing values become null."""
+    # rows are sparse: start from all-null columns and fill only the keys each row has
+    values = {c: [None] * len(rows) for c in columns}
+    for i, r in enumerate(rows):
+        for k, v in r.items():
+            if k in values:
+                values[k][i] = _value(v)
+    arrays = [pa.array(values[c], type=pa.string()).dictionary_encode() for c in columns]
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def _partition_dir(folder: str, manufacturer: Optional[str]) -> str:
+    value = NULL_PARTITION if manufacturer is None else quote(manufacturer, safe="")
+    return os.path.join(folder, f"{PARTITION_COLUMN}={value}")
+
+
+def export_to_parquet(
+    data,
+    folder: str,
+    column_order: Optional[List[str]] = None,
+    priority_cols: Optional[List[str]] = None,
+    replace: bool = True,
+) -> List[str]:
+    """
+    Writes the rows as one Parquet file per manufacturer partition and returns
+    the written paths. Columns follow export_to_csv (priority, registry order,
+    first seen). With `replace`, older files in the touched partitions are
+    removed once the new file is in place, so a re-run replaces a
+    manufacturer's rows instead of duplicating them.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    by_mfr: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for r in _iter_rows(data):
+        by_mfr.setdefault(_value(r.get(PARTITION_COLUMN)), []).append(r)
+    if not by_mfr:
+        print("No valid data to export (empty).")
+        return []
+
+    written = []
+    for mfr, rows in by_mfr.items():
+        columns = _column_order(_first_seen_keys(rows), column_order, priority_cols)
+        columns = [c for c in columns if c != PARTITION_COLUMN]
+        part_dir = _partition_dir(folder, mfr)
+        os.makedirs(part_dir, exist_ok=True)
+        old_parts = glob.glob(os.path.join(part_dir, "part-*.parquet"))
+
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        path = os.path.join(part_dir, name)
+        # dot files are ignored by dataset discovery, so readers never see a partial file
+        tmp = os.path.join(part_dir, f".{name}.tmp")
+        try:
+            pq.write_table(rows_to_table(rows, columns), tmp, compression="zstd", use_dictionary=True)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        if replace:
+            for p in old_parts:
+                os.remove(p)
+        written.append(path)
+
+    print(f"Parquet saved: {folder} ({', '.join(os.path.basename(os.path.dirname(p)) for p in written)})")
+    return written
+
+
+def _dataset(folder: str) -> "ds.Dataset":
+    partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+    dataset = ds.dataset(folder, format="parquet", partitioning=partitioning)
+    # by default the schema comes from one file; unify the footers for the columns added later
+    schemas = [f.physical_schema for f in dataset.get_fragments()]
+    if not schemas:
+        return dataset
+    schema = pa.unify_schemas(schemas + [pa.schema([(PARTITION_COLUMN, pa.string())])])
+    return ds.dataset(folder, format="parquet", partitioning=partitioning, schema=schema)
+
+
+def read_parquet_dataset(
+    folder: str,
+    columns: Optional[List[str]] = None,
+    manufacturers: Optional[List[str]] = None,
+) -> "pa.Table":
+    """Reads only `columns` (all if None) of the given manufacturers (all if None)."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    dataset = _dataset(folder)
+    selected = None if columns is None else [c for c in columns if c in dataset.schema.names]
+    expr = None if manufacturers is None else ds.field(PARTITION_COLUMN).isin(list(manufacturers))
+    return dataset.to_table(columns=selected, filter=expr)
@@ -0,0 +1,116 @@
+# pdfium_backend.py
+"""
+Extraction backend on pypdfium2: text straight from pdfium's text layer,
+tables from a light alignment-based detector (layout.find_tables) instead
+of pdfplumber's ruling-line analysis. Much faster, but it only finds tables
+whose columns are separated by clear gaps.
+
+pdfium is not thread-safe, and extraction runs on pipeline worker threads
+and on the async pipeline's executor threads: every pdfium call here and in
+render.py is made while holding pdfium_lock.
+"""
+
+import threading
+from statistics import median
+from typing import Any, Dict, Iterator, List, Optional
+
+import pypdfium2 as pdfium
+
+from layout import find_tables, split_cells
+
+# chars further apart than this many char heights start a new word
+WORD_GAP_FACTOR = 0.25
+# words whose baselines differ by less than this many heights share a line
+LINE_TOLERANCE = 0.5
+# cell gap in char heights; loose char boxes are about 1.2 em tall, word spaces ~0.25 em
+CELL_GAP_FACTOR = 0.75
+
+# serializes all pdfium document access in this process (reentrant: callers may nest)
+pdfium_lock = threading.RLock()
+
+
+def _words(textpage) -> List[Dict[str, Any]]:
+    n = textpage.count_chars()
+    text = textpage.get_text_range(0, n)
+    if len(text) != n:
+        text = "".join(textpage.get_text_range(i, 1) or " " for i in range(n))
+
+    words, current = [], None
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            current = None
+            continue
+        left, bottom, right, top = textpage.get_charbox(i, loose=True)
+        height = top - bottom
+        if (
+            current is not None
+            and abs(bottom - current["bottom"]) < LINE_TOLERANCE * height
+            and left - current["right"] < WORD_GAP_FACTOR * height
+        ):
+            current["text"] += ch
+            current["right"] = max(current["right"], right)
+            continue
+        current = {"text": ch, "left": left, "right": right, "bottom": bottom, "height": height}
+        words.append(current)
+
+    for w in words:
+        w["width"] = w["right"] - w["left"]
+    return words
+
+
+def _lines(words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Words grouped by baseline, top to bottom, each line sorted left to right."""
+    if not words:
+        return []
+    tolerance = LINE_TOLERANCE * median(w["height"] for w in words)
+    lines: List[List[Dict[str, Any]]] = []
+    for w in sorted(words, key=lambda w: -w["bottom"]):
+        if lines and abs(lines[-1][0]["bottom"] - w["bottom"]) <= tolerance:
+            lines[-1].append(w)
+        else:
+            lines.append([w])
+    return [sorted(line, key=lambda w: w["left"]) for line in lines]
+
+
+class PdfiumBackend:
+    name = "pdfium"
+    version = f"pypdfium2-{getattr(pdfium, 'PYPDFIUM_INFO', '')}"
+
+    def page_count(self, pdf_path: str) -> int:
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+
+    def iter_pages(
+        self,
+        pdf_path: str,
+        start: int = 0,
+        stop: Optional[int] = None,
+        prescan: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        # `prescan` is a pdfplumber setting; the alignment detector is cheap on every page.
+        # The lock is taken per page, never across a yield: the consumer may use pdfium
+        # itself, and the table detection needs no lock.
+        with pdfium_lock:
+            pdf = pdfium.PdfDocument(pdf_path)
+            n_pages = len(pdf)
+        try:
+            stop = n_pages if stop is None else min(stop, n_pages)
+            for i in range(start, stop):
+                with pdfium_lock:
+                    page = pdf[i]
+                    textpage = page.get_textpage()
+                    try:
+                        text = textpage.get_text_range().replace("\r\n", "\n")
+                        words = _words(textpage)
+                    finally:
+                        textpage.close()
+                        page.close()
+                rows = [split_cells(line, CELL_GAP_FACTOR) for line in _lines(words)]
+                yield {"page": i + 1, "text": text, "tables": find_tables(rows), "skipped": False}
+        finally:
+            with pdfium_lock:
+                pdf.close()
@@ -0,0 +1,258 @@
+# pipeline.py
+"""
+Producer/consumer variant of process_with_gpt_two_calls.
+
+Each PDF flows through five stages connected by bounded queues:
+
+    extract -> stage1 (LLM) -> stage2 (LLM) -> normalize -> export
+
+Every stage has its own worker pool, so CPU-bound pdfplumber parsing overlaps
+with network-bound LLM calls. Full queues block the upstream stage
+(backpressure), which keeps memory bounded on large runs. The export stage
+has a single worker and hands results to the sink in input order.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from process_api_variants import (
+    call_and_parse,
+    structured_output_format,
+    load_pdf_tables,
+    extract_drawing_with_vision,
+    try_fast_path,
+    run_stage1,
+    build_stage2_prompt,
+    parse_stage2,
+    run_local_stage2,
+    merge_stage2,
+)
+
+_DONE = object()
+
+
+class _Item:
+    __slots__ = ("index", "pdf_path", "text", "tables", "stage1", "resolved", "llm_rows", "variants", "error")
+
+    def __init__(self, index: int, pdf_path: str):
+        self.index = index
+        self.pdf_path = pdf_path
+        self.text = ""
+        self.tables = []
+        self.stage1 = None
+        self.resolved = []
+        self.llm_rows = None
+        self.variants = None  # set once the PDF is finished (possibly early)
+        self.error = None
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable[[_Item], None], workers: int, in_q: queue.Queue, skip_finished: bool = True):
+        self.name = name
+        self.func = func
+        self.skip_finished = skip_finished
+        self.workers = max(1, workers)
+        self.in_q = in_q
+        self.out_q: Optional[queue.Queue] = None
+        self.next: Optional["_Stage"] = None
+
+        self.processed = 0
+        self.busy = 0.0          # seconds spent in func, summed over workers
+        self.blocked = 0.0       # seconds spent waiting on a full downstream queue
+        self.depth_sum = 0
+        self.depth_max = 0
+        self._queued = 0         # real items put into in_q (or about to be) and not taken yet
+        self._alive = self.workers
+        self._lock = threading.Lock()
+
+    def put(self, item: _Item) -> None:
+        """Queues an item for this stage (the _DONE sentinels go into in_q directly)."""
+        with self._lock:
+            self._queued += 1
+        self.in_q.put(item)
+
+    def _worker(self) -> None:
+        while True:
+            item = self.in_q.get()
+            if item is _DONE:
+                break
+
+            # items still waiting, without the _DONE sentinels: qsize() counts those, and
+            # _queued counts items whose put() is still blocked on a full queue. Sentinels
+            # are only queued after the last item, so the smaller number is the real depth.
+            with self._lock:
+                self._queued -= 1
+                depth = min(self.in_q.qsize(), self._queued)
+            t0 = time.perf_counter()
+            # finished / failed items just pass through to the export stage
+            if not self.skip_finished or (item.error is None and item.variants is None):
+                try:
+                    self.func(item)
+                except Exception as e:
+                    item.error = e
+            elapsed = time.perf_counter() - t0
+
+            if self.next is not None:
+                t1 = time.perf_counter()
+                self.next.put(item)
+                blocked = time.perf_counter() - t1
+            else:
+                blocked = 0.0
+
+            with self._lock:
+                self.processed += 1
+                self.busy += elapsed
+                self.blocked += blocked
+                self.depth_sum += depth
+                self.depth_max = max(self.depth_max, depth)
+
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.next is not None:
+            for _ in range(self.next.workers):
+                self.out_q.put(_DONE)
+
+    def start(self) -> List[threading.Thread]:
+        threads = [
+            threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in threads:
+            t.start()
+        return threads
+
+
+class PdfPipeline:
+    def __init__(
+        self,
+        custom_prompt: str,
+        format_prompt: str,
+        extract_workers: int = 2,
+        stage1_workers: int = 4,
+        stage2_workers: int = 4,
+        queue_size: int = 8,
+        sink: Optional[Callable[[str, Any], None]] = None,
+        known_fields: Optional[List[str]] = None,
+        extract_backend: Optional[str] = None,
+    ):
+        """
+        :param sink: called as sink(pdf_path, variants_or_exception) from the export
+            stage, once per PDF and in input order.
+        """
+        self.custom_prompt = custom_prompt
+        self.format_prompt = format_prompt
+        self.sink = sink
+        self.known_fields = known_fields
+        self.extract_backend = extract_backend
+        self.text_format = structured_output_format(known_fields)
+        self.wall = 0.0
+
+        self._results: Dict[int, Any] = {}
+        self._pending: Dict[int, _Item] = {}
+        self._next_index = 0
+
+        specs = [
+            ("extract", self._extract, extract_workers),
+            ("stage1", self._stage1, stage1_workers),
+            ("stage2", self._stage2, stage2_workers),
+            ("normalize", self._normalize, 1),
+            ("export", self._export, 1),
+        ]
+        skip_finished = {"export": False}
+        self.stages: List[_Stage] = []
+        in_q = queue.Queue(maxsize=queue_size)
+        for name, func, workers in specs:
+            stage = _Stage(name, func, workers, in_q, skip_finished.get(name, True))
+            if self.stages:
+                self.stages[-1].out_q = in_q
+                self.stages[-1].next = stage
+            self.stages.append(stage)
+            in_q = queue.Queue(maxsize=queue_size)
+
+    # ----- stage functions -----
+
+    def _extract(self, item: _Item) -> None:
+        item.text, item.tables = load_pdf_tables(item.pdf_path, self.extract_backend)
+
+    def _stage1(self, item: _Item) -> None:
+        if not item.tables:
+            item.variants = [extract_drawing_with_vision(item.pdf_path)]
+            return
+        local = try_fast_path(item.tables, self.known_fields)
+        if local is not None:
+            item.variants = local
+            return
+        item.stage1 = run_stage1(self.custom_prompt, item.text, item.tables, item.pdf_path, self.text_format)
+        # the raw text is no longer needed; don't keep it queued downstream
+        item.text = ""
+        if not item.stage1:
+            item.variants = []
+
+    def _stage2(self, item: _Item) -> None:
+        # rows the local normalizer resolves skip the LLM; stage1 keeps only the rest
+        item.resolved, item.stage1 = run_local_stage2(item.stage1, self.known_fields)
+        item.llm_rows = []
+        if item.stage1:
+            rows = item.stage1
+            # parsed here so an unparseable answer can be requested again
+            item.llm_rows = call_and_parse(
+                build_stage2_prompt(self.format_prompt, rows),
+                lambda raw: parse_stage2(raw, rows),
+                self.text_format,
+            )
+
+    def _normalize(self, item: _Item) -> None:
+        item.variants = merge_stage2(item.resolved, item.llm_rows)
+
+    def _export(self, item: _Item) -> None:
+        # results may arrive out of order: release them strictly by input index
+        self._pending[item.index] = item
+        while self._next_index in self._pending:
+            done = self._pending.pop(self._next_index)
+            result = done.error if done.error is not None else done.variants
+            self._results[done.index] = (done.pdf_path, result)
+            self._next_index += 1
+            if self.sink is not None:
+                self.sink(done.pdf_path, result)
+
+    # ----- driver -----
+
+    def run(self, pdf_paths: List[str]) -> List[Any]:
+        """Processes all PDFs and returns (pdf_path, variants or exception) in input order."""
+        t0 = time.perf_counter()
+        threads = []
+        for stage in self.stages:
+            threads.extend(stage.start())
+
+        first = self.stages[0]
+
+        def feed():
+            for i, p in enumerate(pdf_paths):
+                first.put(_Item(i, p))
+            for _ in range(first.workers):
+                first.in_q.put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+        feeder.start()
+        feeder.join()
+        for t in threads:
+            t.join()
+
+        self.wall = time.perf_counter() - t0
+        return [self._results[i] for i in range(len(pdf_paths))]
+
+    def report(self) -> str:
+        lines = [f"Pipeline: {self.wall:.1f}s wall"]
+        lines.append(f"  {'stage':10} {'workers':>7} {'items':>6} {'util':>6} {'q avg':>6} {'q max':>6} {'blocked':>8}")
+        for s in self.stages:
+            util = s.busy / (self.wall * s.workers) * 100 if self.wall else 0.0
+            avg = s.depth_sum / s.processed if s.processed else 0.0
+            lines.append(
+                f"  {s.name:10} {s.workers:>7} {s.processed:>6} {util:>5.0f}% {avg:>6.1f} {s.depth_max:>6} {s.blocked:>7.1f}s"
+            )
+        busiest = max(self.stages, key=lambda s: s.busy / s.workers)
+        lines.append(f"  bottleneck: {busiest.name}")
+        return "\n".join(lines)
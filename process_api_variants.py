@@ -1,15 +1,34 @@
-import base64
+import hashlib
 import json
+import os
 import re
-from io import BytesIO
-from typing import Any, Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 import openai
-from pdf2image import convert_from_path
-from PIL import Image
 
+from cache import DiskCache, file_sha256, make_key
 from extract import extract_pdf_content
-from config import OPENAI_API_KEY
+from chunking import split_into_sections, dedupe_variants
+from ocr import ocr_available, ocr_pdf
+from normalizer import load_aliases, normalize_rows_locally, canonicalize_rows, harmonize_rows
+from prompt_compaction import compact_inputs, count_tokens
+from rate_limit import RateLimiter, estimate_tokens
+from render import render_page, to_data_url, page_count, select_pages, dhash, hamming
+from run_stats import stats
+from tolerant_json import JsonArrayStream, parse_json_tolerant
+from config import (
+    FAST_PATH_MIN_CONFIDENCE, LOCAL_STAGE2, FIELD_ALIASES_FILE,
+    PROMPT_COMPACTION, PROMPT_TOKEN_BUDGET, CHUNK_TOKEN_LIMIT, CHUNK_WORKERS,
+    OPENAI_API_KEY, OPENAI_BASE_URL, EXTRACT_WORKERS, CACHE_DIR, EXTRACT_CACHE_MB,
+    LLM_CACHE_MB, LLM_CACHE_TTL_HOURS, LLM_CACHE_BYPASS, STRUCTURED_OUTPUT, PARSE_RETRIES,
+    STREAM_RESPONSES, STREAM_STAGE2_ROWS, VISION_RENDERER, VISION_DPI, VISION_MAX_SIDE,
+    VISION_GRAYSCALE, VISION_IMAGE_FORMAT, VISION_JPEG_QUALITY, RENDER_CACHE_MB,
+    VISION_PAGES, VISION_WORKERS, VISION_DUPLICATE_DISTANCE,
+    LLM_REQUESTS_PER_MIN, LLM_TOKENS_PER_MIN,
+    TABLE_PRESCAN, EXTRACT_BACKEND, OCR_ENABLED, OCR_LANG, OCR_DPI, OCR_MAX_PAGES, OCR_MAX_TEXT_CHARS, OCR_MIN_CONFIDENCE,
+)
 
 # ===== Model =====
 try:
@@ -20,34 +39,121 @@ except Exception:
 
 print("Using OpenAI model:", OPENAI_MODEL)
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+extraction_cache = (
+    DiskCache(os.path.join(CACHE_DIR, "extract"), max_bytes=EXTRACT_CACHE_MB * 1024 * 1024)
+    if EXTRACT_CACHE_MB > 0 else None
+)
+
+render_cache = (
+    DiskCache(os.path.join(CACHE_DIR, "render"), max_bytes=RENDER_CACHE_MB * 1024 * 1024)
+    if RENDER_CACHE_MB > 0 else None
+)
+
+# shared by all vision calls, including the concurrent pages of one drawing set
+vision_limiter = RateLimiter(LLM_REQUESTS_PER_MIN, LLM_TOKENS_PER_MIN)
+
+# rough input tokens of one high-detail page image (6 tiles of 512 px)
+_IMAGE_TOKEN_ESTIMATE = 1105
+
+if OCR_ENABLED and not ocr_available():
+    print("OCR_ENABLED is set but pytesseract/tesseract is not available; scans go to vision")
+
+FIELD_ALIASES = load_aliases(FIELD_ALIASES_FILE)
+
+# temperature=0 answers are replayable, so identical requests are served from disk
+TEMPERATURE = 0
+
+response_cache = (
+    DiskCache(
+        os.path.join(CACHE_DIR, "responses"),
+        max_bytes=LLM_CACHE_MB * 1024 * 1024,
+        ttl_seconds=LLM_CACHE_TTL_HOURS * 3600,
+    )
+    if LLM_CACHE_MB > 0 else None
+)
 
 # ==============================
 # OpenAI Responses API helpers
 # ==============================
 
-def _responses_text(prompt: str) -> str:
-    """Calls the latest OpenAI *Responses* API and returns plain text output."""
-    resp = client.responses.create(
-        model=OPENAI_MODEL,
-        input=prompt,
-        temperature=0,
-    )
-    return (getattr(resp, "output_text", None) or "").strip()
+def record_usage(usage) -> None:
+    """Adds input/cached token counts of one API call (object or raw dict) to the run stats."""
+    if not usage:
+        return
 
-def _responses_vision(prompt: str, image_url: str) -> str:
-    resp = client.responses.create(
-        model=OPENAI_MODEL,
-        input=[{
-            "role": "user",
-            "content": [
-                {"type": "input_text", "text": prompt},
-                {"type": "input_image", "image_url": image_url},
-            ],
-        }],
-        temperature=0,
-    )
-    return (getattr(resp, "output_text", None) or "").strip()
+    def get(obj, name):
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    details = get(usage, "input_tokens_details")
+    stats.incr("llm_calls")
+    stats.incr("input_tokens", get(usage, "input_tokens") or 0)
+    stats.incr("cached_tokens", (get(details, "cached_tokens") if details else 0) or 0)
+
+def _cached_call(key: str, call, use_cache: bool, refresh: bool = False) -> str:
+    if response_cache is None or not use_cache:
+        return call()
+
+    if not (LLM_CACHE_BYPASS or refresh):
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    out = call()
+    if out:
+        response_cache.put(key, out)
+    return out
+
+def text_cache_key(prompt: str, text_format: Optional[Dict[str, Any]] = None) -> str:
+    if text_format:
+        return make_key("text", OPENAI_MODEL, prompt, TEMPERATURE, text_format)
+    return make_key("text", OPENAI_MODEL, prompt, TEMPERATURE)
+
+def _responses_text(
+    prompt: str,
+    use_cache: bool = True,
+    text_format: Optional[Dict[str, Any]] = None,
+    refresh: bool = False,
+) -> str:
+    """
+    Calls the latest OpenAI *Responses* API and returns plain text output.
+    `text_format` is passed as the `text` parameter (structured output);
+    `refresh` skips the cached answer and stores the new one.
+    """
+    def call() -> str:
+        extra = {"text": text_format} if text_format else {}
+        resp = client.responses.create(
+            model=OPENAI_MODEL,
+            input=prompt,
+            temperature=TEMPERATURE,
+            **extra,
+        )
+        record_usage(getattr(resp, "usage", None))
+        return (getattr(resp, "output_text", None) or "").strip()
+
+    return _cached_call(text_cache_key(prompt, text_format), call, use_cache, refresh)
+
+def _responses_vision(prompt: str, image_url: str, use_cache: bool = True) -> str:
+    def call() -> str:
+        vision_limiter.acquire(estimate_tokens(prompt) + _IMAGE_TOKEN_ESTIMATE)
+        resp = client.responses.create(
+            model=OPENAI_MODEL,
+            input=[{
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": prompt},
+                    {"type": "input_image", "image_url": image_url},
+                ],
+            }],
+            temperature=TEMPERATURE,
+        )
+        record_usage(getattr(resp, "usage", None))
+        return (getattr(resp, "output_text", None) or "").strip()
+
+    image_hash = hashlib.sha256(image_url.encode("utf-8")).hexdigest()
+    key = make_key("vision", OPENAI_MODEL, prompt, image_hash, TEMPERATURE)
+    return _cached_call(key, call, use_cache)
 
 # ==============================
 # Utility helpers
@@ -64,13 +170,154 @@ def _extract_json_substring(s: str) -> str:
     starts = [i for i in (s.find("["), s.find("{")) if i != -1]
     return s[min(starts):].strip() if starts else s
 
+def load_model_json(raw: str):
+    """
+    json.loads for model output. Prose around the JSON or a truncated array is
+    repaired (complete variant objects are kept); raises ValueError otherwise.
+    """
+    try:
+        return json.loads(_extract_json_substring(raw))
+    except ValueError:
+        parsed = parse_json_tolerant(raw)
+        stats.incr("parse_repairs")
+        return parsed
+
 def _cell_str(x) -> str:
     return "" if x is None else str(x).strip()
 
+# ==============================
+# Structured output
+# ==============================
+
+def variants_json_schema(known_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """{"variants": [...]} with every registry field as a string property; unknown keys stay allowed."""
+    fields = ["DN"] + [f for f in (known_fields or []) if f != "DN"]
+    return {
+        "type": "object",
+        "properties": {
+            "variants": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {f: {"type": "string"} for f in fields},
+                    "required": ["DN"],
+                    "additionalProperties": {"type": "string"},
+                },
+            },
+        },
+        "required": ["variants"],
+        "additionalProperties": False,
+    }
+
+def structured_output_format(known_fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """The Responses `text` parameter for variant answers, or None when STRUCTURED_OUTPUT is off."""
+    if not STRUCTURED_OUTPUT:
+        return None
+    # strict mode would require every registry field on every row; without it the
+    # API does not enforce the schema and answers still go through parse_json_tolerant
+    return {"format": {
+        "type": "json_schema",
+        "name": "variants",
+        "schema": variants_json_schema(known_fields),
+        "strict": False,
+    }}
+
+def call_and_parse(
+    prompt: str,
+    parse,
+    text_format: Optional[Dict[str, Any]] = None,
+    raw: Optional[str] = None,
+):
+    """
+    _responses_text + parse(raw). An answer that cannot be parsed is requested
+    again (bypassing the cache) up to PARSE_RETRIES times. `raw` is an answer
+    already received (e.g. streamed); it is parsed before any request is made.
+    """
+    for attempt in range(PARSE_RETRIES + 1):
+        if raw is None or attempt > 0:
+            raw = _responses_text(prompt, text_format=text_format, refresh=attempt > 0)
+        try:
+            return parse(raw)
+        except ValueError:
+            stats.incr("parse_failures")
+            if attempt == PARSE_RETRIES:
+                raise
+            stats.incr("parse_retries")
+
+# ==============================
+# Streaming
+# ==============================
+
+def _responses_text_stream(prompt: str, on_text, text_format: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Streaming _responses_text: on_text(delta) is called for every output text
+    delta. A cached answer is replayed as one delta. Returns the full text.
+    """
+    key = text_cache_key(prompt, text_format)
+    if response_cache is not None and not LLM_CACHE_BYPASS:
+        cached = response_cache.get(key)
+        if cached is not None:
+            on_text(cached)
+            return cached
+
+    extra = {"text": text_format} if text_format else {}
+    stream = client.responses.create(
+        model=OPENAI_MODEL,
+        input=prompt,
+        temperature=TEMPERATURE,
+        stream=True,
+        **extra,
+    )
+    parts = []
+    for event in stream:
+        etype = getattr(event, "type", "")
+        if etype == "response.output_text.delta":
+            parts.append(event.delta)
+            on_text(event.delta)
+        elif etype == "response.completed":
+            record_usage(getattr(event.response, "usage", None))
+
+    out = "".join(parts).strip()
+    if response_cache is not None and out:
+        response_cache.put(key, out)
+    return out
+
+def stream_variants(prompt: str, on_row, text_format: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Streams one variant answer. Every complete array element goes through
+    normalize_variant_keys/expand_numeric_dn_columns and on to on_row(row)
+    while the rest of the answer is still being generated. Returns the full text.
+    """
+    parser = JsonArrayStream()
+    started = time.perf_counter()
+    first = []
+
+    def on_text(delta: str) -> None:
+        for element in parser.feed(delta):
+            if not isinstance(element, dict):
+                continue
+            if not first:
+                first.append(time.perf_counter() - started)
+            for row in expand_numeric_dn_columns([normalize_variant_keys(element)]):
+                on_row(row)
+
+    raw = _responses_text_stream(prompt, on_text, text_format)
+    if first:
+        stats.incr("streamed_calls")
+        stats.incr("first_variant_seconds", first[0])
+        stats.incr("full_answer_seconds", time.perf_counter() - started)
+    return raw
+
 # ==============================
 # Table filter
 # ==============================
 
+TABLE_KEYWORDS = [
+    "dn", "nennweite", "nominal", "pressure", "bar",
+    "d", "d1", "d2", "d4", "k", "l", "h", "kg", "gewicht",
+    "gewinde", "anschluss"
+]
+
 def is_meaningful_table(table) -> bool:
     if not isinstance(table, list) or len(table) < 2:
         return False
@@ -84,37 +331,106 @@ def is_meaningful_table(table) -> bool:
         return False
 
     joined = " ".join(c.lower() for c in non_empty)
-    keywords = [
-        "dn", "nennweite", "nominal", "pressure", "bar",
-        "d", "d1", "d2", "d4", "k", "l", "h", "kg", "gewicht",
-        "gewinde", "anschluss"
-    ]
-    return any(k in joined for k in keywords)
+    return any(k in joined for k in TABLE_KEYWORDS)
 
 # ==============================
 # Drawing fallback
 # ==============================
 
-def render_pdf_page_to_data_url(pdf_path: str) -> str:
-    images = convert_from_path(pdf_path, dpi=300, first_page=1, last_page=1)
-    buf = BytesIO()
-    images[0].save(buf, format="PNG")
-    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+def _render_vision_page(pdf_path: str, page_index: int = 0):
+    return render_page(
+        pdf_path,
+        page_index,
+        renderer=VISION_RENDERER,
+        dpi=VISION_DPI,
+        max_side=VISION_MAX_SIDE,
+        grayscale=VISION_GRAYSCALE,
+        fmt=VISION_IMAGE_FORMAT,
+        quality=VISION_JPEG_QUALITY,
+        cache=render_cache,
+    )
+
+def render_pdf_page_to_data_url(pdf_path: str, page_index: int = 0) -> str:
+    return to_data_url(*_render_vision_page(pdf_path, page_index))
 
 DRAWING_VISION_PROMPT = """
 Extract drawing metadata and dimension symbols from this technical drawing.
 Return JSON only.
 """.strip()
 
-def extract_drawing_with_vision(pdf_path: str) -> Dict[str, Any]:
-    img_url = render_pdf_page_to_data_url(pdf_path)
-
+def _vision_page(img_url: str) -> Dict[str, Any]:
     raw = _responses_vision(DRAWING_VISION_PROMPT, img_url)
     try:
-        return json.loads(_extract_json_substring(raw))
+        return load_model_json(raw)
     except Exception:
         return {"doc_type": "drawing", "error": "vision_parse_failed"}
 
+def merge_page_json(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges the answer for a later page into `a`: objects recursively, lists
+    concatenated without duplicates, conflicting values collected in a list.
+    """
+    out = dict(a)
+    for k, v in b.items():
+        cur = out.get(k)
+        if cur in (None, "", "N/A"):
+            out[k] = v
+        elif v in (None, "", "N/A") or v == cur:
+            continue
+        elif isinstance(cur, dict) and isinstance(v, dict):
+            out[k] = merge_page_json(cur, v)
+        else:
+            merged = list(cur) if isinstance(cur, list) else [cur]
+            for x in v if isinstance(v, list) else [v]:
+                if x not in merged:
+                    merged.append(x)
+            out[k] = merged
+    return out
+
+def _extract_drawing_pages(pdf_path: str, pages: List[int]) -> Dict[str, Any]:
+    # pdfium calls are serialized (pdfium_lock): pages are rendered one by one
+    # here and each vision call starts as soon as its page is ready
+    hashes, futures, skipped = [], [], []
+    with ThreadPoolExecutor(max_workers=VISION_WORKERS) as pool:
+        for i in pages:
+            mime, data = _render_vision_page(pdf_path, i)
+            if VISION_DUPLICATE_DISTANCE >= 0:
+                h = dhash(data)
+                if any(hamming(h, seen) <= VISION_DUPLICATE_DISTANCE for seen in hashes):
+                    skipped.append(i + 1)
+                    continue
+                hashes.append(h)
+            futures.append((i + 1, pool.submit(_vision_page, to_data_url(mime, data))))
+        results = [(page, f.result()) for page, f in futures]
+
+    stats.incr("vision_pages", len(results))
+    stats.incr("vision_pages_skipped", len(skipped))
+
+    merged: Dict[str, Any] = {}
+    for _, result in results:
+        merged = merge_page_json(merged, result if isinstance(result, dict) else {"items": result})
+    merged["pages"] = [page for page, _ in results]
+    if skipped:
+        merged["skipped_pages"] = skipped
+    return merged
+
+def _extract_drawing(pdf_path: str) -> Dict[str, Any]:
+    if VISION_PAGES.strip() == "1":
+        return _vision_page(render_pdf_page_to_data_url(pdf_path))
+
+    pages = select_pages(VISION_PAGES, page_count(pdf_path)) or [0]
+    if len(pages) == 1:
+        return _vision_page(render_pdf_page_to_data_url(pdf_path, pages[0]))
+    return _extract_drawing_pages(pdf_path, pages)
+
+def extract_drawing_with_vision(pdf_path: str) -> Dict[str, Any]:
+    """Vision answer for page 1, or the merged answer for the VISION_PAGES selection."""
+    t0 = time.perf_counter()
+    result = _extract_drawing(pdf_path)
+    stats.incr("vision_pdfs")
+    stats.incr("vision_seconds", time.perf_counter() - t0)
+    return result
+
 # ==============================
 # Fallback table parsing
 # ==============================
@@ -195,12 +511,107 @@ def expand_numeric_dn_columns(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]
 
     return out
 
+# ==============================
+# Deterministic table fast path
+# ==============================
+
+_DN_HEADER_RE = re.compile(r"^(dn|nennweite|nominal)", re.IGNORECASE)
+_DN_VALUE_RE = re.compile(r"^(dn\s*)?\d+([.,]\d+)?$", re.IGNORECASE)
+
+def _clean_header(h) -> str:
+    return " ".join(_cell_str(h).split())
+
+def _header_matches_keyword(cell: str) -> bool:
+    # Short keywords ("d", "k", "l") only count as whole tokens, e.g. "d1 [mm]",
+    # otherwise every header containing the letter would match.
+    tokens = re.split(r"[^a-z0-9]+", cell.lower())
+    for k in TABLE_KEYWORDS:
+        if k in tokens or (len(k) >= 3 and k in cell.lower()):
+            return True
+    return False
+
+def score_table_for_fast_path(table, known_fields: Optional[List[str]] = None) -> float:
+    """
+    Confidence (0..1) that a table can be turned into variant rows without the LLM:
+    recognized headers, a DN column holding DN-like values, rows matching the header
+    width, and header names already in the field registry.
+    """
+    if not is_meaningful_table(table):
+        return 0.0
+
+    header = [_clean_header(h) for h in table[0]]
+    rows = [r for r in table[1:] if isinstance(r, list)]
+    named = [i for i, h in enumerate(header) if h]
+    if not rows or len(named) < 2:
+        return 0.0
+
+    # DN column: header says DN/Nennweite/Nominal and (nearly) all values look like sizes
+    dn_cols = [i for i in named if _DN_HEADER_RE.match(header[i])]
+    dn_score = 0.0
+    for i in dn_cols:
+        values = [_cell_str(r[i]) for r in rows if i < len(r)]
+        if values:
+            dn_score = max(dn_score, sum(1 for v in values if _DN_VALUE_RE.match(v)) / len(rows))
+    if dn_score < 0.8:
+        return 0.0
+
+    header_score = sum(1 for i in named if _header_matches_keyword(header[i])) / len(named)
+
+    # same width as the header, no merged/empty cells in named columns
+    consistent = 0
+    for r in rows:
+        if len(r) == len(header) and all(_cell_str(r[i]) for i in named):
+            consistent += 1
+    consistency_score = consistent / len(rows)
+
+    if known_fields:
+        known = set(known_fields)
+        registry_score = sum(1 for i in named if header[i] in known) / len(named)
+    else:
+        registry_score = 0.5
+
+    return 0.3 * dn_score + 0.2 * header_score + 0.35 * consistency_score + 0.15 * registry_score
+
+def extract_variants_locally(tables, known_fields: Optional[List[str]] = None):
+    """
+    Rule-based extraction of all meaningful tables. Returns (rows, confidence),
+    where confidence is the score of the weakest table. Like the LLM path, the
+    rows go through the local key mapping (aliases, registry names) and are
+    merged by DN: tables keyed by the same DNs (dimensions, pressure, weight)
+    give one row per variant.
+    """
+    if not tables:
+        return [], 0.0
+
+    confidence = min(score_table_for_fast_path(t, known_fields) for t in tables)
+    rows = []
+    for table in tables:
+        header = [_clean_header(h) for h in table[0]]
+        for r in table[1:]:
+            row_obj = {}
+            for i, h in enumerate(header):
+                if h:
+                    row_obj[h] = _cell_str(r[i]) if i < len(r) and _cell_str(r[i]) else "N/A"
+            if row_obj:
+                rows.append(normalize_variant_keys(row_obj))
+
+    rows = canonicalize_rows(expand_numeric_dn_columns(rows), known_fields, FIELD_ALIASES)
+    return harmonize_rows(dedupe_variants(rows)), confidence
+
+def try_fast_path(tables, known_fields: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+    """Returns locally extracted rows when every table is confident enough, else None."""
+    rows, confidence = extract_variants_locally(tables, known_fields)
+    if rows and confidence >= FAST_PATH_MIN_CONFIDENCE:
+        stats.incr("fast_path_pdfs")
+        return rows
+    return None
+
 # ==============================
 # Main pipelines
 # ==============================
 
-def process_with_gpt(pdf_path: str, custom_prompt: str) -> List[Dict[str, Any]]:
-    data = extract_pdf_content(pdf_path)
+def process_with_gpt(pdf_path: str, custom_prompt: str, extract_backend: Optional[str] = None) -> List[Dict[str, Any]]:
+    data = _extract(pdf_path, extract_backend)
     text = data.get("text", "")
     tables_raw = data.get("tables", [])
     tables = [t for t in tables_raw if is_meaningful_table(t)]
@@ -208,11 +619,8 @@ def process_with_gpt(pdf_path: str, custom_prompt: str) -> List[Dict[str, Any]]:
     if not tables:
         return [extract_drawing_with_vision(pdf_path)]
 
-    tables_json = json.dumps(tables, ensure_ascii=False)
-    prompt = custom_prompt.replace("{text}", text).replace("{tables}", tables_json)
-
-    raw = _responses_text(prompt)
-    parsed = json.loads(_extract_json_substring(raw))
+    raw = _responses_text(build_stage1_prompt(custom_prompt, text, tables, pdf_path))
+    parsed = load_model_json(raw)
 
     if isinstance(parsed, dict) and "variants" in parsed:
         parsed = parsed["variants"]
@@ -223,22 +631,116 @@ def process_with_gpt(pdf_path: str, custom_prompt: str) -> List[Dict[str, Any]]:
 
     return []
 
-def process_with_gpt_two_calls(pdf_path: str, custom_prompt: str, format_prompt: str) -> List[Dict[str, Any]]:
-    data = extract_pdf_content(pdf_path)
+# Stage helpers, shared by the sync, async and batch pipelines.
+
+def _ocr_pdf_cached(pdf_path: str) -> Optional[Dict[str, Any]]:
+    key = make_key("ocr", file_sha256(pdf_path), OCR_LANG, OCR_DPI, OCR_MAX_PAGES)
+    if extraction_cache is not None:
+        cached = extraction_cache.get(key)
+        if cached is not None:
+            return cached
+    result = ocr_pdf(pdf_path, lang=OCR_LANG, dpi=OCR_DPI, max_pages=OCR_MAX_PAGES)
+    if result is not None and extraction_cache is not None:
+        extraction_cache.put(key, result)
+    return result
+
+def _try_ocr(pdf_path: str):
+    """(text, tables) from local OCR, or None if vision is still needed."""
+    t0 = time.perf_counter()
+    result = _ocr_pdf_cached(pdf_path)
+    if result is None:
+        return None
+    stats.incr("ocr_pdfs")
+    stats.incr("ocr_seconds", time.perf_counter() - t0)
+
+    tables = [t for t in result["tables"] if is_meaningful_table(t)]
+    name = os.path.basename(pdf_path)
+    if result["confidence"] < OCR_MIN_CONFIDENCE or not tables:
+        print(f"OCR {name}: confidence {result['confidence']:.0%}, {len(tables)} tables -> vision")
+        return None
+    stats.incr("ocr_rescued")
+    print(f"OCR {name}: confidence {result['confidence']:.0%}, {len(tables)} tables -> text pipeline")
+    return result["text"], tables
+
+def _extract(pdf_path: str, extract_backend: Optional[str] = None):
+    return extract_pdf_content(
+        pdf_path,
+        workers=EXTRACT_WORKERS,
+        cache=extraction_cache,
+        prescan=TABLE_PRESCAN,
+        backend=extract_backend or EXTRACT_BACKEND,
+    )
+
+def meaningful_tables(pdf_path: str, extract_backend: Optional[str] = None):
+    """The PDF's meaningful tables; goes through the extraction cache, so a later load_pdf_tables() is a hit."""
+    return [t for t in _extract(pdf_path, extract_backend).get("tables", []) if is_meaningful_table(t)]
+
+def load_pdf_tables(pdf_path: str, extract_backend: Optional[str] = None):
+    """
+    Returns (text, meaningful tables) for a PDF, extracted with `extract_backend`
+    (default EXTRACT_BACKEND). With OCR_ENABLED, a PDF without tables and
+    (almost) without a text layer is read by local OCR.
+    """
+    data = _extract(pdf_path, extract_backend)
     text = data.get("text", "")
     tables_raw = data.get("tables", [])
     tables = [t for t in tables_raw if is_meaningful_table(t)]
+    stats.incr("pages", data.get("pages", 0))
+    stats.incr("pages_table_scan_skipped", data.get("pages_skipped", 0))
 
-    if not tables:
-        return [extract_drawing_with_vision(pdf_path)]
+    # a PDF with a real text layer but no tables is a drawing, not a scan
+    if not tables and OCR_ENABLED and len(text.strip()) <= OCR_MAX_TEXT_CHARS:
+        rescued = _try_ocr(pdf_path)
+        if rescued is not None:
+            return rescued
+    return text, tables
 
+def _fill_stage1_prompt(custom_prompt: str, text: str, tables) -> str:
     tables_json = json.dumps(tables, ensure_ascii=False)
-
-    # -------- Stage 1 --------
-    prompt1 = custom_prompt.replace("{text}", text).replace("{tables}", tables_json)
-
-    raw1 = _responses_text(prompt1)
-    parsed1 = json.loads(_extract_json_substring(raw1))
+    return custom_prompt.replace("{text}", text).replace("{tables}", tables_json)
+
+def _compact_stage1_inputs(custom_prompt: str, text: str, tables, pdf_path: str):
+    if not PROMPT_COMPACTION:
+        return text, tables
+
+    before = count_tokens(_fill_stage1_prompt(custom_prompt, text, tables))
+    overhead = count_tokens(_fill_stage1_prompt(custom_prompt, "", []))
+    text, tables = compact_inputs(text, tables, overhead, PROMPT_TOKEN_BUDGET)
+    after = count_tokens(_fill_stage1_prompt(custom_prompt, text, tables))
+
+    stats.incr("prompt_tokens_before", before)
+    stats.incr("prompt_tokens_after", after)
+    print(f"Stage 1 prompt tokens {os.path.basename(pdf_path)}: {before} -> {after}")
+    return text, tables
+
+def build_stage1_prompt(custom_prompt: str, text: str, tables, pdf_path: str = "") -> str:
+    text, tables = _compact_stage1_inputs(custom_prompt, text, tables, pdf_path)
+    return _fill_stage1_prompt(custom_prompt, text, tables)
+
+def plan_stage1_prompts(custom_prompt: str, text: str, tables, pdf_path: str = "") -> List[Tuple[str, Any]]:
+    """
+    Returns the Stage 1 (prompt, tables) pairs for a PDF: a single pair normally,
+    one per section when the prompt exceeds CHUNK_TOKEN_LIMIT.
+    """
+    text, tables = _compact_stage1_inputs(custom_prompt, text, tables, pdf_path)
+    prompt = _fill_stage1_prompt(custom_prompt, text, tables)
+    if CHUNK_TOKEN_LIMIT <= 0 or count_tokens(prompt) <= CHUNK_TOKEN_LIMIT:
+        return [(prompt, tables)]
+
+    overhead = count_tokens(_fill_stage1_prompt(custom_prompt, "", []))
+    sections = split_into_sections(text, tables, CHUNK_TOKEN_LIMIT - overhead)
+    stats.incr("chunked_pdfs")
+    stats.incr("chunk_sections", len(sections))
+    print(f"Stage 1 split into {len(sections)} sections: {os.path.basename(pdf_path)}")
+    return [(_fill_stage1_prompt(custom_prompt, t, tb), tb) for t, tb in sections]
+
+def merge_stage1_sections(parsed: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    if len(parsed) == 1:
+        return parsed[0]
+    return dedupe_variants([r for rows in parsed for r in rows])
+
+def parse_stage1(raw1: str, tables) -> List[Dict[str, Any]]:
+    parsed1 = load_model_json(raw1)
 
     if isinstance(parsed1, dict) and "variants" in parsed1:
         parsed1 = parsed1["variants"]
@@ -250,14 +752,34 @@ def process_with_gpt_two_calls(pdf_path: str, custom_prompt: str, format_prompt:
         fb = fallback_extract_variants_from_tables(tables)
         stage1 = expand_numeric_dn_columns([normalize_variant_keys(r) for r in fb])
 
-    if not stage1:
-        return []
+    return stage1
 
-    # -------- Stage 2 --------
-    prompt2 = format_prompt.replace("{extraction_json}", json.dumps(stage1, ensure_ascii=False))
+def run_stage1(
+    custom_prompt: str,
+    text: str,
+    tables,
+    pdf_path: str = "",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Stage 1 as a single call, or map-reduce over sections for very large catalogs."""
+    plan = plan_stage1_prompts(custom_prompt, text, tables, pdf_path)
+
+    def section(p):
+        prompt, section_tables = p
+        return call_and_parse(prompt, lambda raw: parse_stage1(raw, section_tables), text_format)
 
-    raw2 = _responses_text(prompt2)
-    parsed2 = json.loads(_extract_json_substring(raw2))
+    if len(plan) == 1:
+        return section(plan[0])
+
+    with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(plan))) as pool:
+        parsed = list(pool.map(section, plan))
+    return merge_stage1_sections(parsed)
+
+def build_stage2_prompt(format_prompt: str, stage1: List[Dict[str, Any]]) -> str:
+    return format_prompt.replace("{extraction_json}", json.dumps(stage1, ensure_ascii=False))
+
+def parse_stage2(raw2: str, stage1: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    parsed2 = load_model_json(raw2)
 
     if isinstance(parsed2, dict) and "variants" in parsed2:
         parsed2 = parsed2["variants"]
@@ -268,3 +790,129 @@ def process_with_gpt_two_calls(pdf_path: str, custom_prompt: str, format_prompt:
 
     return stage1
 
+def run_local_stage2(stage1: List[Dict[str, Any]], known_fields: Optional[List[str]] = None):
+    """Splits Stage 1 rows into (normalized locally, left for the Stage 2 LLM call)."""
+    if not LOCAL_STAGE2:
+        return [], stage1
+    resolved, unresolved = normalize_rows_locally(stage1, known_fields, FIELD_ALIASES)
+    _record_local_stage2(len(stage1), len(resolved))
+    return resolved, unresolved
+
+def _record_local_stage2(rows: int, local: int) -> None:
+    stats.incr("stage2_rows", rows)
+    stats.incr("stage2_rows_local", local)
+    if rows == local:
+        stats.incr("stage2_local_pdfs")
+
+def merge_stage2(resolved: List[Dict[str, Any]], llm_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not resolved:
+        return llm_rows
+    return harmonize_rows(resolved + llm_rows)
+
+def _call_stage2(format_prompt: str, rows: List[Dict[str, Any]], text_format=None) -> List[Dict[str, Any]]:
+    return call_and_parse(
+        build_stage2_prompt(format_prompt, rows),
+        lambda raw: parse_stage2(raw, rows),
+        text_format,
+    )
+
+def run_stage2(
+    format_prompt: str,
+    stage1: List[Dict[str, Any]],
+    known_fields: Optional[List[str]] = None,
+    text_format: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Local normalizer first; only the rows it cannot resolve go to the Stage 2 LLM call."""
+    resolved, unresolved = run_local_stage2(stage1, known_fields)
+    if not unresolved:
+        return harmonize_rows(resolved)
+    return merge_stage2(resolved, _call_stage2(format_prompt, unresolved, text_format))
+
+def run_two_calls_streaming(
+    custom_prompt: str,
+    format_prompt: str,
+    text: str,
+    tables,
+    pdf_path: str = "",
+    known_fields: Optional[List[str]] = None,
+    text_format: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Stage 1 streamed: each variant is normalized locally as soon as it is
+    parsed, and rows the normalizer cannot resolve go to Stage 2 in groups of
+    STREAM_STAGE2_ROWS while Stage 1 is still generating.
+    """
+    plan = plan_stage1_prompts(custom_prompt, text, tables, pdf_path)
+    if len(plan) > 1:
+        # sections are deduplicated against each other first: no early Stage 2
+        stage1 = run_stage1(custom_prompt, text, tables, pdf_path, text_format)
+        return run_stage2(format_prompt, stage1, known_fields, text_format) if stage1 else []
+
+    prompt, section_tables = plan[0]
+    stage1, resolved, pending, futures = [], [], [], []
+
+    with ThreadPoolExecutor(max_workers=CHUNK_WORKERS) as pool:
+        def flush() -> None:
+            futures.append(pool.submit(_call_stage2, format_prompt, pending[:], text_format))
+            pending.clear()
+
+        def on_row(row: Dict[str, Any]) -> None:
+            stage1.append(row)
+            if LOCAL_STAGE2:
+                done, todo = normalize_rows_locally([row], known_fields, FIELD_ALIASES)
+            else:
+                done, todo = [], [row]
+            resolved.extend(done)
+            pending.extend(todo)
+            if len(pending) >= STREAM_STAGE2_ROWS:
+                flush()
+
+        raw = stream_variants(prompt, on_row, text_format)
+
+        if not stage1:
+            # nothing streamed (not an array, or empty): repair, table fallback, retries
+            stage1 = call_and_parse(prompt, lambda r: parse_stage1(r, section_tables), text_format, raw=raw)
+            return run_stage2(format_prompt, stage1, known_fields, text_format) if stage1 else []
+
+        if LOCAL_STAGE2:
+            _record_local_stage2(len(stage1), len(resolved))
+        if pending:
+            flush()
+        llm_rows = [r for f in futures for r in f.result()]
+
+    if not futures:
+        return harmonize_rows(resolved)
+    return merge_stage2(resolved, llm_rows)
+
+def process_with_gpt_two_calls(
+    pdf_path: str,
+    custom_prompt: str,
+    format_prompt: str,
+    known_fields: Optional[List[str]] = None,
+    extract_backend: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    text, tables = load_pdf_tables(pdf_path, extract_backend)
+
+    if not tables:
+        return [extract_drawing_with_vision(pdf_path)]
+
+    # -------- Clean DN tables: no LLM needed --------
+    local = try_fast_path(tables, known_fields)
+    if local is not None:
+        return local
+
+    text_format = structured_output_format(known_fields)
+
+    if STREAM_RESPONSES:
+        return run_two_calls_streaming(
+            custom_prompt, format_prompt, text, tables, pdf_path, known_fields, text_format
+        )
+
+    # -------- Stage 1 --------
+    stage1 = run_stage1(custom_prompt, text, tables, pdf_path, text_format)
+
+    if not stage1:
+        return []
+
+    # -------- Stage 2 --------
+    return run_stage2(format_prompt, stage1, known_fields, text_format)
@@ -0,0 +1,148 @@
+# prompt_compaction.py
+"""
+Shrinks the Stage 1 payload before it goes into the prompt:
+
+- continuation tables (same header on every catalog page) are merged into one
+- text lines whose numbers are already in the tables are dropped
+- footers, legal notes and other boilerplate lines are stripped
+- if the result is still over the token budget, the text is cut (tables win)
+"""
+
+import json
+import re
+from typing import Any, List, Tuple
+
+from rate_limit import estimate_tokens
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """Local token count: tiktoken when installed, otherwise a ~4 chars/token estimate."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text or "", disallowed_special=()))
+    return estimate_tokens(text)
+
+
+# ==============================
+# Tables
+# ==============================
+
+def _row_key(row) -> Tuple[str, ...]:
+    return tuple(" ".join(str(c).split()) if c is not None else "" for c in row)
+
+
+def merge_continuation_tables(tables: List[List[Any]]) -> List[List[Any]]:
+    """
+    Merges tables with identical headers into the first one (first-seen order)
+    and drops header rows repeated inside the body.
+    """
+    merged: List[List[Any]] = []
+    by_header = {}
+    for table in tables:
+        if not table:
+            continue
+        header = _row_key(table[0])
+        target = by_header.get(header)
+        if target is None:
+            target = [table[0]]
+            by_header[header] = target
+            merged.append(target)
+        for row in table[1:]:
+            if _row_key(row) != header:
+                target.append(row)
+    return merged
+
+
+# ==============================
+# Text
+# ==============================
+
+_BOILERPLATE_RES = [re.compile(p, re.IGNORECASE) for p in (
+    r"©|\(c\)\s*\d{4}|copyright",
+    r"alle rechte vorbehalten|all rights reserved",
+    r"änderungen vorbehalten|subject to (technical )?change|irrtümer",
+    r"ohne gewähr|without (any )?(guarantee|warranty)",
+    r"allgemeine(n)? geschäftsbedingungen|terms and conditions|\bagb\b",
+    r"^(seite|page)\s*\d+(\s*(von|of|/)\s*\d+)?$",
+    r"www\.|https?://|@[\w-]+\.\w+",
+    r"\b(tel|fax|phone)\.?\s*[:+]?\s*[\d(+]",
+)]
+
+_NUM_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def strip_boilerplate(text: str) -> str:
+    lines = text.splitlines()
+    # lines repeated on many pages (running headers/footers) carry no variant data
+    counts = {}
+    for line in lines:
+        key = line.strip()
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+
+    out = []
+    for line in lines:
+        key = line.strip()
+        if not key:
+            continue
+        if counts[key] >= 3 and len(_NUM_RE.findall(key)) < 2:
+            continue
+        if any(r.search(key) for r in _BOILERPLATE_RES):
+            continue
+        out.append(line)
+    return "\n".join(out)
+
+
+def drop_text_covered_by_tables(text: str, tables: List[List[Any]]) -> str:
+    """Drops lines whose numbers are (almost) all present in the tables already."""
+    table_numbers = set()
+    for table in tables:
+        for row in table:
+            for cell in row:
+                if cell is not None:
+                    table_numbers.update(_NUM_RE.findall(str(cell)))
+
+    out = []
+    for line in text.splitlines():
+        numbers = _NUM_RE.findall(line)
+        if len(numbers) >= 2 and sum(1 for n in numbers if n in table_numbers) >= 0.8 * len(numbers):
+            continue
+        out.append(line)
+    return "\n".join(out)
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    # cut whole lines from the end; prose at the start (product name, series) matters most
+    lines = text.splitlines()
+    lo, hi = 0, len(lines)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens("\n".join(lines[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return "\n".join(lines[:lo])
+
+
+def compact_inputs(text: str, tables: List[List[Any]], prompt_overhead: int, budget: int) -> Tuple[str, List[List[Any]]]:
+    """
+    Returns compacted (text, tables). `prompt_overhead` is the token count of the
+    prompt without payload; the text is cut so that everything fits `budget`
+    where possible. Tables are never cut.
+    """
+    tables = merge_continuation_tables(tables)
+    text = strip_boilerplate(text or "")
+    text = drop_text_covered_by_tables(text, tables)
+
+    table_tokens = count_tokens(json.dumps(tables, ensure_ascii=False))
+    text = trim_to_tokens(text, budget - prompt_overhead - table_tokens)
+    return text, tables
@@ -0,0 +1,82 @@
+# rate_limit.py
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token), good enough for rate limiting."""
+    return len(text or "") // 4 + 1
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float) -> float:
+        """Takes `amount` if available and returns 0, otherwise returns the seconds to wait."""
+        self._refill()
+        # a single request larger than the bucket may go through once it is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min limits, usable from threads (acquire) and from
+    asyncio code (acquire_async). A limit of 0 or None disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def _try(self, tokens: int) -> float:
+        with self._lock:
+            wait = 0.0
+            if self.requests is not None:
+                self.requests._refill()
+                if self.requests.level < 1:
+                    wait = (1 - self.requests.level) / self.requests.rate
+            if self.tokens is not None:
+                self.tokens._refill()
+                need = min(tokens, self.tokens.capacity)
+                if self.tokens.level < need:
+                    wait = max(wait, (need - self.tokens.level) / self.tokens.rate)
+            if wait > 0:
+                return wait
+            # both buckets have room: take from both atomically
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            return 0.0
+
+    def acquire(self, tokens: int = 0) -> None:
+        while True:
+            wait = self._try(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        while True:
+            wait = self._try(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
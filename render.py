@@ -0,0 +1,143 @@
+# render.py
+"""
+Page rendering for the vision fallback.
+
+The pdfium renderer runs in-process (no poppler subprocess), renders straight
+at the capped size and encodes grayscale JPEG or optimized PNG. Encoded
+images are cached by PDF hash, page and render settings. The poppler
+renderer (pdf2image, 300 dpi colour PNG) is kept for comparison.
+"""
+
+import base64
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+from cache import DiskCache, file_sha256, make_key
+from pdfium_backend import pdfium_lock
+
+_MIME = {"jpeg": "image/jpeg", "png": "image/png"}
+
+
+def render_image(pdf_path: str, page_index: int, dpi: int, max_side: int, grayscale: bool) -> Image.Image:
+    # pdfium is not thread-safe (see pdfium_backend); the encoding afterwards runs unlocked
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page = pdf[page_index]
+            width, height = page.get_size()  # points
+            scale = dpi / 72
+            if max_side > 0:
+                scale = min(scale, max_side / max(width, height))
+            bitmap = page.render(scale=scale, grayscale=grayscale)
+            # a copy: the bitmap's buffer belongs to pdfium
+            image = bitmap.to_pil().copy()
+            bitmap.close()
+            page.close()
+            return image
+        finally:
+            pdf.close()
+
+
+def _poppler_image(pdf_path: str, page_index: int, dpi: int) -> Image.Image:
+    from pdf2image import convert_from_path
+    return convert_from_path(pdf_path, dpi=dpi, first_page=page_index + 1, last_page=page_index + 1)[0]
+
+
+def encode_image(image: Image.Image, fmt: str = "jpeg", quality: int = 85) -> bytes:
+    buf = BytesIO()
+    if fmt == "jpeg":
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        image.save(buf, format="JPEG", quality=quality, optimize=True)
+    else:
+        image.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def render_page(
+    pdf_path: str,
+    page_index: int = 0,
+    renderer: str = "pdfium",
+    dpi: int = 150,
+    max_side: int = 2048,
+    grayscale: bool = True,
+    fmt: str = "jpeg",
+    quality: int = 85,
+    cache: Optional[DiskCache] = None,
+) -> Tuple[str, bytes]:
+    """Returns (mime type, encoded image) for one page."""
+    if renderer == "poppler":
+        # legacy path: full-colour PNG at the requested dpi, not cached
+        buf = BytesIO()
+        _poppler_image(pdf_path, page_index, dpi).save(buf, format="PNG")
+        return "image/png", buf.getvalue()
+
+    key = None
+    if cache is not None:
+        key = make_key("render", file_sha256(pdf_path), page_index, dpi, max_side, grayscale, fmt, quality)
+        data = cache.get_bytes(key)
+        if data is not None:
+            return _MIME[fmt], data
+
+    data = encode_image(render_image(pdf_path, page_index, dpi, max_side, grayscale), fmt, quality)
+    if cache is not None:
+        cache.put_bytes(key, data)
+    return _MIME[fmt], data
+
+
+def to_data_url(mime: str, data: bytes) -> str:
+    return f"data:{mime};base64," + base64.b64encode(data).decode()
+
+
+def page_count(pdf_path: str) -> int:
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def select_pages(spec: str, n_pages: int) -> List[int]:
+    """
+    0-based page indexes for a 1-based selection like "1", "all" or "1,3-5".
+    Pages beyond the document are ignored.
+    """
+    spec = (spec or "1").strip().lower()
+    if spec == "all":
+        return list(range(n_pages))
+
+    pages: List[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            numbers = range(int(first), int(last) + 1)
+        else:
+            numbers = [int(part)]
+        for n in numbers:
+            if 1 <= n <= n_pages and n - 1 not in pages:
+                pages.append(n - 1)
+    return pages
+
+
+def dhash(data: bytes, size: int = 8) -> int:
+    """Difference hash of an encoded image: near-identical sheets differ in only a few bits."""
+    image = Image.open(BytesIO(data)).convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(image.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
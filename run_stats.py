@@ -0,0 +1,89 @@
+# run_stats.py
+import threading
+from collections import Counter
+from typing import List
+
+
+class RunStats:
+    """Thread-safe counters for one manufacturer run (reset by the GUI per run)."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def report(self, pdf_count: int) -> List[str]:
+        lines = []
+        fast = self.get("fast_path_pdfs")
+        if pdf_count:
+            lines.append(f"Served locally (no LLM): {fast:.0f} of {pdf_count} PDFs ({fast / pdf_count * 100:.0f}%)")
+        rows = self.get("stage2_rows")
+        if rows:
+            local = self.get("stage2_rows_local")
+            lines.append(
+                f"Stage 2 normalized locally: {local:.0f} of {rows:.0f} rows; "
+                f"{self.get('stage2_local_pdfs'):.0f} PDFs needed no Stage 2 call"
+            )
+        pages = self.get("pages")
+        if pages:
+            skipped = self.get("pages_table_scan_skipped")
+            lines.append(f"Table pre-scan: table extraction skipped on {skipped:.0f} of {pages:.0f} pages")
+        before = self.get("prompt_tokens_before")
+        if before:
+            after = self.get("prompt_tokens_after")
+            lines.append(f"Stage 1 prompt tokens: {before:.0f} -> {after:.0f} ({(1 - after / before) * 100:.0f}% saved)")
+        chunked = self.get("chunked_pdfs")
+        if chunked:
+            lines.append(f"Large PDFs split for Stage 1: {chunked:.0f} ({self.get('chunk_sections'):.0f} sections)")
+        repairs, failures = self.get("parse_repairs"), self.get("parse_failures")
+        if repairs or failures:
+            lines.append(
+                f"LLM JSON answers: {repairs:.0f} repaired, {failures:.0f} unparseable, "
+                f"{self.get('parse_retries'):.0f} re-requested"
+            )
+        vision_pages = self.get("vision_pages")
+        if vision_pages:
+            lines.append(
+                f"Vision pages: {vision_pages:.0f} sent, "
+                f"{self.get('vision_pages_skipped'):.0f} near-duplicates skipped"
+            )
+        ocr = self.get("ocr_pdfs")
+        if ocr:
+            rescued = self.get("ocr_rescued")
+            line = (
+                f"Local OCR: {rescued:.0f} of {ocr:.0f} scanned PDFs rescued without vision "
+                f"({self.get('ocr_seconds'):.1f}s OCR)"
+            )
+            vision = self.get("vision_pdfs")
+            if rescued and vision:
+                saved = rescued * self.get("vision_seconds") / vision
+                line += f", ~{saved:.0f}s of vision calls avoided"
+            lines.append(line)
+        streamed = self.get("streamed_calls")
+        if streamed:
+            lines.append(
+                f"Streaming: first variant after {self.get('first_variant_seconds') / streamed:.1f}s on average "
+                f"(full answer {self.get('full_answer_seconds') / streamed:.1f}s, {streamed:.0f} calls)"
+            )
+        input_tokens = self.get("input_tokens")
+        if input_tokens:
+            cached = self.get("cached_tokens")
+            lines.append(
+                f"Provider prompt cache: {cached:.0f} of {input_tokens:.0f} input tokens cached "
+                f"({cached / input_tokens * 100:.0f}% hit ratio, {self.get('llm_calls'):.0f} API calls)"
+            )
+        return lines
+
+
+stats = RunStats()
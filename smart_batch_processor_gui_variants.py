@@ -3,14 +3,38 @@ from tkinter import filedialog, messagebox
 from tkinter.scrolledtext import ScrolledText
 from tkinter.simpledialog import askstring
 import os
-
-from pdf_to_prompt_variants import generate_format_prompt_for_variants, generate_extraction_prompt_for_pdf
-
-from process_api_variants import process_with_gpt_two_calls
-
-from export import export_to_csv
-from pdf_to_prompt_variants import generate_format_prompt_for_variants
-from field_registry import get_known_fields, update_fields
+import queue
+import threading
+
+from pdf_to_prompt_variants import generate_format_prompt_for_variants, generate_extraction_prompt_for_pdf, PDF_PAYLOAD_TEMPLATE
+
+from process_api_variants import (
+    process_with_gpt_two_calls, meaningful_tables, extraction_cache, response_cache, render_cache, client,
+)
+from run_stats import stats
+
+from async_pipeline import process_pdfs_concurrently
+from pipeline import PdfPipeline
+from batch_mode import OpenAIBatchBackend, run_batch
+from extract import EXTRACTION_BACKENDS
+from cache import file_sha256
+from dedup import DuplicateIndex, table_fingerprint
+from config import (
+    DEDUP_PDFS, DEDUP_TABLES, EXTRACT_BACKEND, PARQUET_DIR, PARQUET_EXPORT, PER_PDF_CSV, RESULT_DB, RUN_MODE,
+    LLM_CONCURRENCY, LLM_REQUESTS_PER_MIN, LLM_TOKENS_PER_MIN,
+    PIPELINE_EXTRACT_WORKERS, PIPELINE_LLM_WORKERS, PIPELINE_QUEUE_SIZE, BATCH_POLL_SECONDS,
+)
+
+from export import append_to_csv, export_to_csv
+from parquet_export import export_to_parquet, parquet_available
+from variant_store import VariantStore
+from field_registry import get_known_fields, get_registry, update_fields
+
+# how often the Tk loop picks up progress of a batch run (milliseconds)
+BATCH_UI_POLL_MS = 500
+
+if PARQUET_EXPORT and not parquet_available():
+    print("PARQUET_EXPORT is set but pyarrow is not installed; only CSVs are written")
 
 FIELD_POLICY_TEMPLATE = """You are extracting product variants into structured rows for a CSV/ERP import.
 
@@ -38,6 +62,17 @@ class VariantExtractionApp:
         self.manufacturer_prompts = {}
         # manufacturer -> list[pdf_path]
         self.manufacturer_pdfs = {}
+        # manufacturer -> extraction backend name (EXTRACT_BACKEND if not set)
+        self.manufacturer_backends = {}
+        # first copies of every PDF processed this session, for duplicate detection
+        self.dedup = DuplicateIndex()
+        # result database of the output folder (opened on first use)
+        self.store = None
+        # set when this manufacturer run replaced stored rows: the global CSV is then re-exported
+        self.rows_replaced = False
+        # RUN_MODE=batch: the worker thread waiting for the Batch API, and its cancel flag
+        self.batch_thread = None
+        self.batch_cancel = None
 
         # manufacturer selection
         self.current_mfr_var = tk.StringVar(value="(none)")
@@ -53,6 +88,8 @@ class VariantExtractionApp:
         tk.Button(top, text="Add PDFs to Current Mfr", command=self.add_pdfs_to_current_mfr).grid(row=0, column=3, padx=5)
         tk.Button(top, text="Run Current Manufacturer", command=self.run_current_manufacturer).grid(row=0, column=4, padx=5)
         tk.Button(top, text="Run ALL Manufacturers", command=self.run_all_manufacturers).grid(row=0, column=5, padx=5)
+        tk.Button(top, text="Export per-PDF CSVs", command=self.export_pdf_csvs).grid(row=0, column=6, padx=5)
+        tk.Button(top, text="Cancel Batch", command=self.cancel_batch).grid(row=0, column=7, padx=5)
 
         # Manufacturer picker
         mfr_frame = tk.Frame(root)
@@ -65,6 +102,12 @@ class VariantExtractionApp:
         self.count_label = tk.Label(mfr_frame, text="PDFs: 0")
         self.count_label.pack(side=tk.LEFT, padx=12)
 
+        tk.Label(mfr_frame, text="Extraction backend:").pack(side=tk.LEFT, padx=(12, 0))
+        self.backend_var = tk.StringVar(value=EXTRACT_BACKEND)
+        tk.OptionMenu(
+            mfr_frame, self.backend_var, *EXTRACTION_BACKENDS, command=self._set_mfr_backend
+        ).pack(side=tk.LEFT, padx=8)
+
         # Log
         self.log = tk.Text(root, width=110, height=16, wrap=tk.WORD)
         self.log.pack(padx=10, pady=10)
@@ -99,6 +142,39 @@ class VariantExtractionApp:
             self.output_folder = folder
             self.log_message(f"Output folder set: {folder}")
 
+    def _global_csv_path(self) -> str:
+        return os.path.join(self.output_folder, self.global_csv_name.get().strip() or "combined_variants_all.csv")
+
+    def _get_store(self):
+        """The output folder's VariantStore, None without output folder or with RESULT_DB off."""
+        if not RESULT_DB or not self.output_folder:
+            return None
+        path = os.path.join(self.output_folder, RESULT_DB)
+        if self.store is None or self.store.path != path:
+            if self.store is not None:
+                self.store.close()
+            new = not os.path.exists(path)
+            self.store = VariantStore(path)
+            global_rows_path = self._global_csv_path()
+            if new and os.path.exists(global_rows_path):
+                # the global CSV is exported from the store from now on: keep the rows of earlier runs
+                n_rows = self.store.import_csv(global_rows_path)
+                self.log_message(f"Imported {n_rows} rows of {os.path.basename(global_rows_path)} into {RESULT_DB}")
+        return self.store
+
+    def _put_rows(self, store, mfr: str, pdf_path: str, rows, file_hash=None) -> None:
+        if store.has_pdf(mfr, pdf_path):
+            self.rows_replaced = True
+        store.put_pdf(mfr, pdf_path, rows, file_hash=file_hash)
+
+    def export_pdf_csvs(self):
+        store = self._get_store()
+        if store is None:
+            messagebox.showwarning("No Result Database", "Select an output folder (and keep RESULT_DB enabled).")
+            return
+        written = store.export_pdf_csvs(self.output_folder)
+        self.log_message(f"Exported {len(written)} per-PDF CSVs from {store.path}")
+
     def _refresh_mfr_menu(self):
         menu = self.mfr_menu["menu"]
         menu.delete(0, "end")
@@ -124,6 +200,14 @@ class VariantExtractionApp:
 
         count = len(self.manufacturer_pdfs.get(name, [])) if name != "(none)" else 0
         self.count_label.config(text=f"PDFs: {count}")
+        self.backend_var.set(self.manufacturer_backends.get(name, EXTRACT_BACKEND))
+
+    def _set_mfr_backend(self, backend: str):
+        mfr = self.current_mfr_var.get()
+        if mfr == "(none)":
+            return
+        self.manufacturer_backends[mfr] = backend
+        self.log_message(f"Extraction backend for {mfr}: {backend}")
 
     def add_manufacturer(self):
         name = askstring("Add Manufacturer", "Manufacturer name (e.g., Berluto, Götze, LESER):")
@@ -198,31 +282,212 @@ class VariantExtractionApp:
         if not base:
             base = self.custom_prompt.get("1.0", tk.END).strip()
 
-        master = generate_extraction_prompt_for_pdf()
+        master = generate_extraction_prompt_for_pdf(include_payload=False)
 
+        # static parts first, per-PDF payload last (stable prefix for provider prompt caching)
         return (
                 master
                 + "\n\n"
                 + field_policy
                 + "\n\nMANUFACTURER INSTRUCTIONS:\n"
                 + base
+                + "\n\n"
+                + PDF_PAYLOAD_TEMPLATE
         )
 
-    def _run_manufacturer(self, mfr: str, show_dialogs: bool = True):
+    def _iter_pdf_results(self, pdfs, final_prompt: str, format_prompt: str, known_fields, extract_backend: str):
+        """Yields (pdf_path, variants or exception) in input order (batch mode runs through _start_batch)."""
+        if RUN_MODE == "async":
+            self.log_message(f"Processing {len(pdfs)} PDFs concurrently (max {LLM_CONCURRENCY} in flight)")
+            self.root.update_idletasks()
+            yield from process_pdfs_concurrently(
+                pdfs,
+                final_prompt,
+                format_prompt,
+                concurrency=LLM_CONCURRENCY,
+                requests_per_minute=LLM_REQUESTS_PER_MIN,
+                tokens_per_minute=LLM_TOKENS_PER_MIN,
+                known_fields=known_fields,
+                extract_backend=extract_backend,
+            )
+            return
+
+        for pdf_path in pdfs:
+            self.log_message(f"Processing: {os.path.basename(pdf_path)}")
+            try:
+                yield pdf_path, process_with_gpt_two_calls(
+                    pdf_path,
+                    custom_prompt=final_prompt,
+                    format_prompt=format_prompt,
+                    known_fields=known_fields,
+                    extract_backend=extract_backend,
+                )
+            except Exception as e:
+                yield pdf_path, e
+
+    def _split_duplicates(self, mfr: str, pdfs, extract_backend: str):
+        """Returns (PDFs to process, [(pdf_path, first copy's mfr, first copy's path, reason)])."""
+        if not DEDUP_PDFS:
+            return list(pdfs), []
+        if DEDUP_TABLES and extraction_cache is None:
+            self.log_message("DEDUP_TABLES is on, but the extraction cache is off (EXTRACT_CACHE_MB=0): "
+                             "\"same tables\" matching is disabled, only identical files are reused")
+        originals, duplicates = [], []
+        for pdf_path in pdfs:
+            try:
+                byte_fp = file_sha256(pdf_path)
+                # table fingerprints extract the PDF here, ahead of the run, so they are opt-in;
+                # without the extraction cache the run would extract it a second time
+                table_fp = None
+                if DEDUP_TABLES and extraction_cache is not None:
+                    table_fp = table_fingerprint(meaningful_tables(pdf_path, extract_backend))
+            except Exception as e:
+                self.log_message(f"Fingerprinting failed for {os.path.basename(pdf_path)}: {e}")
+                originals.append(pdf_path)
+                continue
+            first = self.dedup.match(mfr, pdf_path, byte_fp, table_fp)
+            if first is None:
+                originals.append(pdf_path)
+            else:
+                duplicates.append((pdf_path,) + first)
+        return originals, duplicates
+
+    def _handle_pdf_result(self, mfr: str, pdf_path: str, variants, log) -> list:
+        """Stamps meta fields, updates the registry, stores the rows (or writes the per-PDF CSV). Returns the rows."""
+        filename = os.path.basename(pdf_path)
+        base, _ = os.path.splitext(filename)
+
+        if isinstance(variants, Exception):
+            log(f"Error processing {filename}: {variants}")
+            return []
+
+        store = self._get_store()
+        try:
+            if not variants:
+                log("No variant rows returned.")
+                if store is not None:
+                    # a re-run without rows must not leave the previous run's rows behind
+                    self._put_rows(store, mfr, pdf_path, [])
+                return []
+
+            # Add meta fields (kept as strings for CSV export)
+            for r in variants:
+                if isinstance(r, dict):
+                    r["Manufacturer"] = mfr
+                    r["Source PDF"] = filename
+                    r["Source PDF Path"] = pdf_path
+
+            # Update registry with newly seen keys
+            new_fields = update_fields(self.output_folder, [r for r in variants if isinstance(r, dict)])
+            if new_fields:
+                log(f"New fields discovered: {', '.join(new_fields)}")
+
+            rows = [r for r in variants if isinstance(r, dict)]
+
+            # Store the rows (replaces the PDF's rows from an earlier run)
+            if store is not None:
+                self._put_rows(store, mfr, pdf_path, rows, file_hash=file_sha256(pdf_path))
+                log(f"Stored {len(rows)} rows in {RESULT_DB}")
+
+            # Save per-PDF CSV
+            if store is None or PER_PDF_CSV:
+                per_pdf_csv = os.path.join(self.output_folder, f"{mfr}__{base}_variants.csv")
+                export_to_csv(variants, per_pdf_csv)
+                log(f"Saved per PDF CSV: {per_pdf_csv}")
+
+            self.dedup.store(mfr, pdf_path, rows)
+            return rows
+
+        except Exception as e:
+            log(f"Error processing {filename}: {e}")
+            return []
+
+    def _start_batch(self, run: dict, on_done=None):
+        """
+        Runs the batch on a worker thread: waiting for the Batch API can take
+        up to 24h and must not block the Tk loop. Log lines and results come
+        back through a queue that _poll_batch drains on the Tk thread.
+        """
+        events = queue.Queue()
+        cancel = threading.Event()
+
+        def work():
+            try:
+                results = run_batch(
+                    run["pdfs"],
+                    run["final_prompt"],
+                    run["format_prompt"],
+                    OpenAIBatchBackend(client),
+                    os.path.join(self.output_folder, "batches"),
+                    poll_seconds=BATCH_POLL_SECONDS,
+                    log=lambda msg: events.put(("log", msg)),
+                    known_fields=run["known_fields"],
+                    extract_backend=run["extract_backend"],
+                    cancel=cancel,
+                )
+                for item in results:
+                    events.put(("result", item))
+            except Exception as e:
+                events.put(("log", f"Batch run failed: {e}"))
+            events.put(("done", None))
+
+        self.log_message(f"Submitting {len(run['pdfs'])} PDFs to the Batch API (Cancel Batch stops waiting)")
+        self.batch_cancel = cancel
+        self.batch_thread = threading.Thread(target=work, name="batch-run", daemon=True)
+        self.batch_thread.start()
+        self.root.after(BATCH_UI_POLL_MS, self._poll_batch, run, events, on_done)
+
+    def _poll_batch(self, run: dict, events: queue.Queue, on_done=None):
+        while True:
+            try:
+                kind, item = events.get_nowait()
+            except queue.Empty:
+                self.root.after(BATCH_UI_POLL_MS, self._poll_batch, run, events, on_done)
+                return
+            if kind == "log":
+                self.log_message(item)
+            elif kind == "result":
+                pdf_path, variants = item
+                run["rows"].extend(self._handle_pdf_result(run["mfr"], pdf_path, variants, self.log_message))
+            else:
+                self.batch_thread = None
+                self._finish_manufacturer(run)
+                if on_done is not None:
+                    on_done()
+                return
+
+    def cancel_batch(self):
+        if self.batch_thread is None:
+            self.log_message("No batch run in progress.")
+            return
+        self.batch_cancel.set()
+        self.log_message("Cancelling the batch run...")
+
+    def _run_manufacturer(self, mfr: str, show_dialogs: bool = True, on_done=None) -> bool:
+        """
+        Runs one manufacturer. Returns True if it continues in the background
+        (RUN_MODE=batch); on_done is called once that run has finished.
+        """
+        if self.batch_thread is not None:
+            if show_dialogs:
+                messagebox.showwarning("Batch Running", "Wait for the batch run to finish or cancel it first.")
+            else:
+                self.log_message(f"Skipping {mfr}: a batch run is in progress")
+            return False
         if mfr == "(none)":
             if show_dialogs:
                 messagebox.showwarning("No Manufacturer", "Select a manufacturer first.")
-            return
+            return False
         if not self.output_folder:
             if show_dialogs:
                 messagebox.showwarning("No Output Folder", "Please select an output folder.")
-            return
+            return False
 
         pdfs = self.manufacturer_pdfs.get(mfr, [])
         if not pdfs:
             if show_dialogs:
                 messagebox.showwarning("No PDFs", f"No PDFs added for {mfr}.")
-            return
+            return False
 
         # Save current editor prompt into manufacturer prompt
         # Only do this for the currently-selected manufacturer.
@@ -234,73 +499,138 @@ class VariantExtractionApp:
         # Build final prompt with known fields included
         final_prompt = self._build_prompt_for_run(self.manufacturer_prompts.get(mfr, ""))
 
-        self.log_message(f"\n=== Running manufacturer: {mfr} | PDFs: {len(pdfs)} ===")
+        extract_backend = self.manufacturer_backends.get(mfr, EXTRACT_BACKEND)
+        self.log_message(f"\n=== Running manufacturer: {mfr} | PDFs: {len(pdfs)} | backend: {extract_backend} ===")
+        for cache in (extraction_cache, response_cache, render_cache):
+            if cache is not None:
+                cache.reset_stats()
+        stats.reset()
+        self.rows_replaced = False
+        known_fields = get_known_fields(self.output_folder)
+        self._get_store()  # opened here, not on the pipeline's export thread
+        all_pdfs = pdfs
+        pdfs, duplicates = self._split_duplicates(mfr, pdfs, extract_backend)
 
         manufacturer_rows = []
-        global_rows_path = os.path.join(self.output_folder, self.global_csv_name.get().strip() or "combined_variants_all.csv")
-
-        for pdf_path in pdfs:
-            filename = os.path.basename(pdf_path)
-            base, _ = os.path.splitext(filename)
-            self.log_message(f"Processing: {filename}")
-
-            try:
-                variants = process_with_gpt_two_calls(
-                    pdf_path,
-                    custom_prompt=final_prompt,
-                    format_prompt=format_prompt
-                )
-
-                if not variants:
-                    self.log_message("No variant rows returned.")
-                    continue
-
-                # Add meta fields (kept as strings for CSV export)
-                for r in variants:
-                    if isinstance(r, dict):
-                        r["Manufacturer"] = mfr
-                        r["Source PDF"] = filename
-                        r["Source PDF Path"] = pdf_path
-
-                # Update registry with newly seen keys
-                new_fields = update_fields(self.output_folder, [r for r in variants if isinstance(r, dict)])
-                if new_fields:
-                    self.log_message(f"New fields discovered: {', '.join(new_fields)}")
-
-                # Save per-PDF CSV
-                per_pdf_csv = os.path.join(self.output_folder, f"{mfr}__{base}_variants.csv")
-                export_to_csv(variants, per_pdf_csv)
-                self.log_message(f"Saved per PDF CSV: {per_pdf_csv}")
-
-                manufacturer_rows.extend([r for r in variants if isinstance(r, dict)])
-
-            except Exception as e:
-                self.log_message(f"Error processing {filename}: {e}")
+        run = {
+            "mfr": mfr,
+            "pdfs": pdfs,
+            "all_pdfs": all_pdfs,
+            "duplicates": duplicates,
+            "rows": manufacturer_rows,
+            "final_prompt": final_prompt,
+            "format_prompt": format_prompt,
+            "known_fields": known_fields,
+            "extract_backend": extract_backend,
+        }
+
+        if RUN_MODE == "batch":
+            self._start_batch(run, on_done)
+            return True
+
+        if RUN_MODE == "pipeline":
+            # the export stage runs on a worker thread: buffer log lines, Tk is not thread-safe
+            pending_log = []
+            pipeline = PdfPipeline(
+                final_prompt,
+                format_prompt,
+                extract_workers=PIPELINE_EXTRACT_WORKERS,
+                stage1_workers=PIPELINE_LLM_WORKERS,
+                stage2_workers=PIPELINE_LLM_WORKERS,
+                queue_size=PIPELINE_QUEUE_SIZE,
+                sink=lambda p, v: manufacturer_rows.extend(self._handle_pdf_result(mfr, p, v, pending_log.append)),
+                known_fields=known_fields,
+                extract_backend=extract_backend,
+            )
+            self.log_message(f"Processing {len(pdfs)} PDFs in pipeline mode")
+            self.root.update_idletasks()
+            pipeline.run(pdfs)
+            for line in pending_log:
+                self.log_message(line)
+            self.log_message(pipeline.report())
+        else:
+            results = self._iter_pdf_results(pdfs, final_prompt, format_prompt, known_fields, extract_backend)
+            for pdf_path, variants in results:
+                manufacturer_rows.extend(self._handle_pdf_result(mfr, pdf_path, variants, self.log_message))
+
+        self._finish_manufacturer(run)
+        return False
+
+    def _finish_manufacturer(self, run: dict):
+        """Duplicates, combined CSVs, Parquet and the run reports once the PDFs are processed."""
+        mfr = run["mfr"]
+        pdfs, all_pdfs, duplicates = run["pdfs"], run["all_pdfs"], run["duplicates"]
+        manufacturer_rows = run["rows"]
+        final_prompt, format_prompt = run["final_prompt"], run["format_prompt"]
+        known_fields, extract_backend = run["known_fields"], run["extract_backend"]
+        global_rows_path = self._global_csv_path()
+
+        # Duplicates: reuse the first copy's rows; process them after all if it has none
+        retry = {}
+        for pdf_path, first_mfr, first_path, reason in duplicates:
+            rows = self.dedup.rows(first_mfr, first_path)
+            if rows is None:
+                retry[pdf_path] = (first_mfr, first_path)
+                continue
+            self.log_message(f"Duplicate: {os.path.basename(pdf_path)} = {first_mfr}/{os.path.basename(first_path)} ({reason})")
+            manufacturer_rows.extend(self._handle_pdf_result(mfr, pdf_path, rows, self.log_message))
+        if retry:
+            # few PDFs: batch mode retries them serially too
+            results = self._iter_pdf_results(list(retry), final_prompt, format_prompt, known_fields, extract_backend)
+            for pdf_path, variants in results:
+                rows = self._handle_pdf_result(mfr, pdf_path, variants, self.log_message)
+                if rows:
+                    # stands in for the failed first copy from now on
+                    self.dedup.store(*retry[pdf_path], rows)
+                manufacturer_rows.extend(rows)
 
         # Save manufacturer combined CSV
         if manufacturer_rows:
             mfr_combined_name = f"{mfr}{self.mfr_csv_suffix.get().strip() or '_combined.csv'}"
             mfr_combined_path = os.path.join(self.output_folder, mfr_combined_name)
-            export_to_csv(manufacturer_rows, mfr_combined_path)
+            store = self._get_store()
+            if store is not None:
+                # every stored PDF of the manufacturer, including earlier runs
+                store.export_csv(mfr_combined_path, manufacturer=mfr)
+            else:
+                export_to_csv(manufacturer_rows, mfr_combined_path)
             self.log_message(f" Manufacturer combined CSV saved: {mfr_combined_path}")
 
-            # Append into global CSV
-            global_rows = []
-            if os.path.exists(global_rows_path):
+            if PARQUET_EXPORT and parquet_available():
+                parquet_folder = os.path.join(self.output_folder, PARQUET_DIR)
+                # the partition is replaced: with a store, write all of the manufacturer's PDFs like its CSV
+                parquet_rows = manufacturer_rows if store is None else store.rows(manufacturer=mfr)
                 try:
-                    import pandas as pd
-                    df_old = pd.read_csv(global_rows_path, dtype=str, keep_default_na=False)
-                    global_rows = df_old.to_dict(orient="records")
-                except Exception:
-                    global_rows = []
-
-            global_rows.extend(manufacturer_rows)
-            export_to_csv(global_rows, global_rows_path)
+                    export_to_parquet(parquet_rows, parquet_folder, column_order=get_known_fields(self.output_folder))
+                    self.log_message(f" Parquet dataset updated: {parquet_folder}")
+                except Exception as e:
+                    self.log_message(f"Parquet export failed: {e}")
+
+            if store is not None and (self.rows_replaced or not os.path.exists(global_rows_path)):
+                # re-processed PDFs replace their rows: export the whole store again
+                store.export_csv(global_rows_path)
+            else:
+                # only new PDFs: append into global CSV (rewritten only when new columns appear)
+                append_to_csv(manufacturer_rows, global_rows_path)
             self.log_message(f" Global combined CSV updated: {global_rows_path}")
 
         else:
             self.log_message("No rows extracted for this manufacturer.")
 
+        # new fields are written behind; persist them at the end of every run
+        get_registry(self.output_folder).flush()
+
+        if extraction_cache is not None:
+            self.log_message(f"Extraction cache: {extraction_cache.stats()}")
+        if response_cache is not None:
+            self.log_message(f"LLM response cache: {response_cache.stats()}")
+        if render_cache is not None:
+            self.log_message(f"Render cache: {render_cache.stats()}")
+        reused = len(duplicates) - len(retry)
+        if duplicates:
+            self.log_message(f"Duplicates reused: {reused} of {len(all_pdfs)} PDFs (no extraction or LLM calls)")
+        for line in stats.report(len(pdfs) + len(retry)):
+            self.log_message(line)
         self.log_message(f"=== Done: {mfr} ===\n")
 
     def run_current_manufacturer(self):
@@ -317,13 +647,28 @@ class VariantExtractionApp:
             messagebox.showwarning("No Manufacturers", "No manufacturers added.")
             return
 
+        if self.batch_thread is not None:
+            messagebox.showwarning("Batch Running", "Wait for the batch run to finish or cancel it first.")
+            return
+
         self.log_message(f"\n=== Running ALL manufacturers: {len(manufacturers)} ===")
-        for mfr in manufacturers:
+        self.batch_cancel = None
+        self._run_next_manufacturer(manufacturers)
+
+    def _run_next_manufacturer(self, remaining):
+        # batch runs finish in the background and continue the loop from their on_done
+        if self.batch_cancel is not None and self.batch_cancel.is_set():
+            self.log_message("=== Cancelled: ALL manufacturers ===\n")
+            return
+        while remaining:
+            mfr, remaining = remaining[0], remaining[1:]
             if not self.manufacturer_pdfs.get(mfr, []):
                 self.log_message(f"Skipping {mfr}: no PDFs")
                 continue
             self.current_mfr_var.set(mfr)
-            self._run_manufacturer(mfr, show_dialogs=False)
+            rest = remaining
+            if self._run_manufacturer(mfr, show_dialogs=False, on_done=lambda: self._run_next_manufacturer(rest)):
+                return
 
         self.log_message("=== Done: ALL manufacturers ===\n")
 
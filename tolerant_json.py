@@ -0,0 +1,137 @@
+# tolerant_json.py
+"""
+JSON parsing for model output that may be wrapped in prose or cut off.
+
+JsonArrayStream is an incremental scanner: feed it text as it arrives and
+it returns every element of the first JSON array as soon as the element is
+complete. parse_json_tolerant uses it to salvage truncated answers: every
+complete variant object before the cut is kept.
+
+The variants json_schema is sent with "strict": False (strict mode would
+require every registry field on every row), so the API does not enforce it:
+answers that parse are down to this module, not to structured output.
+"""
+
+import json
+import re
+from typing import Any, List
+
+
+def _strip_code_fences(s: str) -> str:
+    s = (s or "").strip()
+    s = re.sub(r"^```(?:json)?\s*", "", s, flags=re.IGNORECASE)
+    s = re.sub(r"\s*```$", "", s)
+    return s.strip()
+
+
+class JsonArrayStream:
+    """
+    Yields the elements of the first JSON array in a text stream. For
+    {"variants": [...]} that is the variants array. Text before the array
+    (prose, code fences) is skipped.
+    """
+
+    def __init__(self):
+        self._buf = []          # characters of the element being scanned
+        self._started = False   # inside the root array
+        self._finished = False
+        self._depth = 0         # nesting depth inside the current element
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        out = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._buf.append(ch)
+            elif ch in "[{":
+                self._depth += 1
+                self._buf.append(ch)
+            elif ch in "]}":
+                if self._depth == 0:
+                    # end of the root array
+                    self._emit(out)
+                    self._finished = True
+                    continue
+                self._depth -= 1
+                self._buf.append(ch)
+                if self._depth == 0:
+                    self._emit(out)
+            elif ch == "," and self._depth == 0:
+                self._emit(out)
+            else:
+                self._buf.append(ch)
+        return out
+
+    def _emit(self, out: List[Any]) -> None:
+        text = "".join(self._buf).strip()
+        self._buf = []
+        if not text:
+            return
+        try:
+            out.append(json.loads(text))
+        except ValueError:
+            pass
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+
+def _holds_objects(value: Any) -> bool:
+    # an object, or an array of objects; "[1]" or "[mm]" in the prose is not an answer
+    if isinstance(value, dict):
+        return True
+    return isinstance(value, list) and all(isinstance(v, dict) for v in value)
+
+
+_START_RE = re.compile(r"[\[{]")
+
+
+def parse_json_tolerant(raw: str):
+    """
+    The first JSON object, or array of objects, in `raw`. Values in the prose
+    around it (e.g. "see table [1]") are skipped. If that value is cut off,
+    returns the list of its complete array elements instead. Raises
+    ValueError when nothing can be recovered.
+    """
+    s = _strip_code_fences(raw)
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        m = _START_RE.search(s, pos)
+        if m is None:
+            break
+        start = m.start()
+        try:
+            # prose after the JSON is ignored: decode just this value
+            value, end = decoder.raw_decode(s, start)
+        except ValueError:
+            # truncated (or not JSON at all): salvage the complete elements
+            items = [v for v in JsonArrayStream().feed(s[start:]) if isinstance(v, dict)]
+            if items:
+                return items
+            pos = start + 1
+            continue
+        if _holds_objects(value):
+            return value
+        pos = end
+    raise ValueError("no JSON variants could be recovered from the model output")
@@ -0,0 +1,252 @@
+# variant_store.py
+"""
+SQLite store for the extracted variant rows (one database per output folder).
+
+Every PDF is stored once, keyed by (manufacturer, source path). Re-processing
+a PDF replaces its rows in a single transaction instead of adding them
+again. The rows are kept as JSON objects in their original key order, so the
+CSV exports reproduce what export_to_csv wrote from the in-memory rows. The
+columns people search by (Manufacturer, Source PDF, DN, row content hash)
+are copied out of the JSON and indexed.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from export import export_to_csv
+
+META_FIELDS = ("Manufacturer", "Source PDF", "Source PDF Path")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    id INTEGER PRIMARY KEY,
+    manufacturer TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    source_pdf TEXT NOT NULL,
+    file_hash TEXT,
+    processed_at REAL NOT NULL,
+    UNIQUE (manufacturer, source_path)
+);
+CREATE TABLE IF NOT EXISTS variants (
+    id INTEGER PRIMARY KEY,
+    pdf_id INTEGER NOT NULL REFERENCES pdfs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    manufacturer TEXT,
+    source_pdf TEXT,
+    dn TEXT,
+    content_hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS variants_pdf ON variants (pdf_id, position);
+CREATE INDEX IF NOT EXISTS variants_manufacturer ON variants (manufacturer);
+CREATE INDEX IF NOT EXISTS variants_source_pdf ON variants (source_pdf);
+CREATE INDEX IF NOT EXISTS variants_dn ON variants (dn);
+CREATE INDEX IF NOT EXISTS variants_content_hash ON variants (content_hash);
+CREATE INDEX IF NOT EXISTS pdfs_file_hash ON pdfs (file_hash);
+"""
+
+# rows per executemany() call inside a PDF's transaction
+INSERT_BATCH = 500
+# rows fetched per query when reading
+PAGE_SIZE = 1000
+
+
+def content_hash(row: Dict[str, Any]) -> str:
+    """Hash of a row without its meta fields: the same variant from two PDFs hashes equal."""
+    payload = {k: v for k, v in row.items() if k not in META_FIELDS}
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _text(v: Any) -> Optional[str]:
+    return None if v is None else str(v)
+
+
+class VariantStore:
+    """
+    Thread-safe (one connection behind a lock): the pipeline mode stores
+    results from its export thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ----- writes -----
+
+    def put_pdf(
+        self,
+        manufacturer: str,
+        pdf_path: str,
+        rows: List[Dict[str, Any]],
+        file_hash: Optional[str] = None,
+    ) -> int:
+        """Replaces the PDF's rows (upsert) in one transaction; returns the number of rows stored."""
+        rows = [r for r in rows if isinstance(r, dict)]
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                (pdf_id,) = cur.execute(
+                    "INSERT INTO pdfs (manufacturer, source_path, source_pdf, file_hash, processed_at) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (manufacturer, source_path) DO UPDATE SET "
+                    "source_pdf = excluded.source_pdf, file_hash = excluded.file_hash, "
+                    "processed_at = excluded.processed_at "
+                    "RETURNING id",
+                    (manufacturer, pdf_path, os.path.basename(pdf_path), file_hash, time.time()),
+                ).fetchone()
+                cur.execute("DELETE FROM variants WHERE pdf_id = ?", (pdf_id,))
+                for start in range(0, len(rows), INSERT_BATCH):
+                    cur.executemany(
+                        "INSERT INTO variants (pdf_id, position, manufacturer, source_pdf, dn, content_hash, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                pdf_id,
+                                start + i,
+                                _text(r.get("Manufacturer", manufacturer)),
+                                _text(r.get("Source PDF", os.path.basename(pdf_path))),
+                                _text(r.get("DN")),
+                                content_hash(r),
+                                json.dumps(r, ensure_ascii=False, default=str),
+                            )
+                            for i, r in enumerate(rows[start:start + INSERT_BATCH])
+                        ],
+                    )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def import_csv(self, csv_path: str) -> int:
+        """
+        Loads a combined CSV written before the store existed and returns the
+        number of rows read. Rows are grouped by (Manufacturer, Source PDF
+        Path). The old append duplicated re-processed PDFs: a PDF that shows
+        up in several runs of consecutive rows keeps only its last run (the
+        upsert replaces the earlier ones). "N/A" cells are left out, since the
+        exports write them back for missing keys.
+        """
+        n_rows = 0
+        block_key, block = None, []
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            for rec in csv.DictReader(f):
+                row = {k: v for k, v in rec.items() if k is not None and v != "N/A"}
+                key = (row.get("Manufacturer", ""), row.get("Source PDF Path") or row.get("Source PDF", ""))
+                if key != block_key:
+                    if block:
+                        self.put_pdf(*block_key, block)
+                    block_key, block = key, []
+                block.append(row)
+                n_rows += 1
+        if block:
+            self.put_pdf(*block_key, block)
+        return n_rows
+
+    def delete_pdf(self, manufacturer: str, pdf_path: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM pdfs WHERE manufacturer = ? AND source_path = ?", (manufacturer, pdf_path)
+            )
+            return cur.rowcount > 0
+
+    # ----- reads -----
+
+    def has_pdf(self, manufacturer: str, pdf_path: str) -> bool:
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT 1 FROM pdfs WHERE manufacturer = ? AND source_path = ?", (manufacturer, pdf_path)
+            ).fetchone()
+        return found is not None
+
+    def rows(
+        self,
+        manufacturer: Optional[str] = None,
+        pdf_path: Optional[str] = None,
+        dn: Optional[str] = None,
+        source_pdf: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stored rows in processing order (PDF, then position), optionally filtered."""
+        where, params = [], []
+        for column, value in (
+            ("p.manufacturer", manufacturer),
+            ("p.source_path", pdf_path),
+            ("v.dn", dn),
+            ("v.source_pdf", source_pdf),
+        ):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = (
+            "SELECT v.pdf_id, v.position, v.data FROM variants v JOIN pdfs p ON p.id = v.pdf_id "
+            "WHERE (v.pdf_id, v.position) > (?, ?)"
+            + "".join(f" AND {w}" for w in where)
+            + f" ORDER BY v.pdf_id, v.position LIMIT {PAGE_SIZE}"
+        )
+        # keyset pages, each fetched under the lock, so a long export neither holds
+        # the lock throughout nor pays for OFFSET scans
+        last = (-1, -1)
+        while True:
+            with self._lock:
+                page = self._conn.execute(sql, last + tuple(params)).fetchall()
+            for _, _, data in page:
+                yield json.loads(data)
+            if len(page) < PAGE_SIZE:
+                return
+            last = page[-1][:2]
+
+    def pdfs(self, manufacturer: Optional[str] = None) -> List[Tuple[str, str, int]]:
+        """(manufacturer, source path, row count) per stored PDF."""
+        sql = (
+            "SELECT p.manufacturer, p.source_path, COUNT(v.id) FROM pdfs p "
+            "LEFT JOIN variants v ON v.pdf_id = p.id"
+        )
+        params: Tuple = ()
+        if manufacturer is not None:
+            sql += " WHERE p.manufacturer = ?"
+            params = (manufacturer,)
+        sql += " GROUP BY p.id ORDER BY p.id"
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def same_content(self, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Stored rows with the same content as `row` (any manufacturer or PDF)."""
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT data FROM variants WHERE content_hash = ? ORDER BY pdf_id, position", (content_hash(row),)
+            ).fetchall()
+        return [json.loads(data) for (data,) in found]
+
+    # ----- CSV exports -----
+
+    def export_csv(self, output_path: str, manufacturer: Optional[str] = None, column_order: Optional[List[str]] = None) -> None:
+        """Combined CSV of one manufacturer, or of everything (streamed, see export_to_csv)."""
+        export_to_csv(self.rows(manufacturer=manufacturer), output_path, column_order)
+
+    def export_pdf_csvs(self, output_folder: str, manufacturer: Optional[str] = None) -> List[str]:
+        """The per-PDF CSVs ({mfr}__{base}_variants.csv) on demand; returns the written paths."""
+        written = []
+        for mfr, source_path, count in self.pdfs(manufacturer):
+            if not count:
+                continue
+            base, _ = os.path.splitext(os.path.basename(source_path))
+            path = os.path.join(output_folder, f"{mfr}__{base}_variants.csv")
+            export_to_csv(self.rows(manufacturer=mfr, pdf_path=source_path), path)
+            written.append(path)
+        return written